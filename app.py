@@ -1,48 +1,159 @@
 from gevent import monkey
 monkey.patch_all()
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, session, abort, stream_with_context, g, send_file
 from flask_socketio import SocketIO, join_room, leave_room, emit
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
 from flask_migrate import Migrate
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import or_
+from werkzeug.utils import safe_join
+from sqlalchemy import or_, insert, select
+from sqlalchemy.orm import joinedload
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
 from game.logic import UltimateTicTacToe
-import random, string, os
+from game.bitboard import BitboardUltimateTicTacToe
+from game import mcts, analysis
+from game.book import PositionBook, canonical_key
+from game.store import MemoryStore, RedisStore, NAMESPACES
+from game.rating import INITIAL_RATING, Leaderboard, elo_update
+from game.replay import SnapshotCache, positions
+from game.matchmaking import MatchQueue
+from game.wire import pack_state
+from game.assets import load_manifest
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict, deque
+from datetime import datetime
+import atexit, functools, json, mimetypes, multiprocessing, random, signal, string, os, threading, time
+import gevent.threadpool
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'a_secret_key')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3')
+app.config['GAME_ENGINE'] = os.environ.get('GAME_ENGINE', 'list')
+app.config['BOT_WORKERS'] = int(os.environ.get('BOT_WORKERS', 2))
+app.config['BOOK_PATH'] = os.environ.get('BOOK_PATH')
+# Redis URL shared by every worker; unset keeps rooms in this process (single worker only)
+app.config['GAME_STORE_URL'] = os.environ.get('GAME_STORE_URL')
+app.config['SOCKETIO_MESSAGE_QUEUE'] = os.environ.get('SOCKETIO_MESSAGE_QUEUE', app.config['GAME_STORE_URL'])
+# 'msgpack' switches every socket to binary packets (needs the msgpack package; pages load the matching client build)
+app.config['SOCKETIO_SERIALIZER'] = os.environ.get('SOCKETIO_SERIALIZER', 'json')
+# Rooms with no connected sockets are evicted after ROOM_IDLE_TTL seconds without activity
+app.config['ROOM_IDLE_TTL'] = int(os.environ.get('ROOM_IDLE_TTL', 900))
+app.config['ROOM_SWEEP_INTERVAL'] = int(os.environ.get('ROOM_SWEEP_INTERVAL', 60))
+app.config['CHAT_HISTORY_LIMIT'] = int(os.environ.get('CHAT_HISTORY_LIMIT', 100))
+app.config['CHAT_MAX_LENGTH'] = 500
+# In-process rooms are written here every ROOM_SNAPSHOT_INTERVAL seconds and on shutdown, and restored at startup
+app.config['ROOM_SNAPSHOT_PATH'] = os.environ.get('ROOM_SNAPSHOT_PATH')
+app.config['ROOM_SNAPSHOT_INTERVAL'] = int(os.environ.get('ROOM_SNAPSHOT_INTERVAL', 30))
+# Each account may send CHAT_RATE_LIMIT messages per CHAT_RATE_WINDOW seconds (as a burst, refilling steadily)
+app.config['CHAT_RATE_LIMIT'] = 5
+app.config['CHAT_RATE_WINDOW'] = 5.0
+# Messages to a room are broadcast together at most every CHAT_FLUSH_INTERVAL seconds
+app.config['CHAT_FLUSH_INTERVAL'] = 0.1
+# Finished matches are queued and inserted in batches of MATCH_BATCH_SIZE or every MATCH_FLUSH_INTERVAL seconds
+app.config['MATCH_BATCH_SIZE'] = int(os.environ.get('MATCH_BATCH_SIZE', 50))
+app.config['MATCH_FLUSH_INTERVAL'] = float(os.environ.get('MATCH_FLUSH_INTERVAL', 1.0))
+# A batch that fails this many times in a row (about three minutes with the backoff) is logged and dropped
+app.config['MATCH_MAX_ATTEMPTS'] = 10
+app.config['MATCH_HISTORY_PAGE_SIZE'] = 20
+app.config['LEADERBOARD_SIZE'] = 50
+# Each worker keeps its own leaderboard and applies only the matches it wrote. Alone (no GAME_STORE_URL) that is all of
+# them; behind a shared store the others' results arrive by reloading from the database every LEADERBOARD_MAX_AGE seconds
+app.config['LEADERBOARD_MAX_AGE'] = float(os.environ.get('LEADERBOARD_MAX_AGE', 60 if app.config['GAME_STORE_URL'] else 0))
+# Replays cache the position every REPLAY_SNAPSHOT_INTERVAL plies so ?from= seeks without replaying the whole log
+app.config['REPLAY_SNAPSHOT_INTERVAL'] = int(os.environ.get('REPLAY_SNAPSHOT_INTERVAL', 10))
+app.config['LOOP_LAG_INTERVAL'] = 0.5
+# Quick match pairs players within QUICK_MATCH_WINDOW rating points, widening by QUICK_MATCH_WIDEN per second waited
+app.config['QUICK_MATCH_WINDOW'] = 100
+app.config['QUICK_MATCH_WIDEN'] = 25
+app.config['QUICK_MATCH_SWEEP_INTERVAL'] = 1.0
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 3600))
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 10000))
+# PBKDF2 hashes run on this many native threads; beyond that up to PASSWORD_HASH_QUEUE wait, the rest are turned away
+app.config['PASSWORD_HASH_THREADS'] = int(os.environ.get('PASSWORD_HASH_THREADS', 2))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+# Output of `python -m game.assets build static static/dist`; without a build, pages use the plain static files
+app.config['ASSET_BUILD_DIR'] = os.environ.get('ASSET_BUILD_DIR', os.path.join(app.static_folder, 'dist'))
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600
+# Finished games are analysed ANALYSIS_DEPTH plies deep per position on their own process pool; a move that gives
+# away ANALYSIS_BLUNDER_THRESHOLD points or more is a blunder. The last ANALYSIS_CACHE_SIZE evaluations are kept.
+# Guest games and games shorter than ANALYSIS_MIN_MOVES are not analysed, nor any beyond ANALYSIS_MAX_PENDING at once
+app.config['ANALYSIS_WORKERS'] = int(os.environ.get('ANALYSIS_WORKERS', 1))
+app.config['ANALYSIS_MAX_PENDING'] = int(os.environ.get('ANALYSIS_MAX_PENDING', 4))
+app.config['ANALYSIS_MIN_MOVES'] = 10
+app.config['ANALYSIS_DEPTH'] = int(os.environ.get('ANALYSIS_DEPTH', 4))
+app.config['ANALYSIS_BLUNDER_THRESHOLD'] = 50
+app.config['ANALYSIS_CACHE_SIZE'] = int(os.environ.get('ANALYSIS_CACHE_SIZE', 200000))
+app.config['BOT_LEVELS'] = {
+    'easy': {'playouts': 300},
+    'medium': {'think_time': 0.5},
+    'hard': {'think_time': 2.0},
+}
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
-socketio = SocketIO(app, async_mode='gevent')
+BINARY_WIRE = app.config['SOCKETIO_SERIALIZER'] == 'msgpack'
+socketio = SocketIO(app, async_mode='gevent', message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'],
+                    serializer='msgpack' if BINARY_WIRE else 'default')
 login_manager = LoginManager(app)
 login_manager.login_view = 'landing'
 
-games = {}
-guest_games = {}
-active_players = set()
+ENGINES = {'list': UltimateTicTacToe, 'bitboard': BitboardUltimateTicTacToe}
+# Rooms plus the user id -> (namespace, room) index of users seated in an unfinished game
+store = RedisStore(app.config['GAME_STORE_URL'], ENGINES, chat_history_limit=app.config['CHAT_HISTORY_LIMIT']) if app.config['GAME_STORE_URL'] else MemoryStore()
+# sid -> (namespace, room, role) for the sockets connected to this worker
+sid_index = {}
+BOT_ID = 'bot'
+room_sweeper = None
+snapshot_writer = None
+room_metrics = {'evicted': 0}
+replay_cache = SnapshotCache(app.config['REPLAY_SNAPSHOT_INTERVAL'])
+# position_key -> evaluation at ANALYSIS_DEPTH, shared by every game this worker analyses
+analysis_cache = analysis.EvalCache(app.config['ANALYSIS_CACHE_SIZE'])
+bot_pool = None
+analysis_pool = None
+position_book = None
+loop_monitor = None
+hash_pool = None
+# Quick-match queues live in this worker: point every client at one worker (or shard by namespace) to share them
+match_queues = {namespace: MatchQueue(app.config['QUICK_MATCH_WINDOW'], app.config['QUICK_MATCH_WIDEN']) for namespace in NAMESPACES}
+queued_sids = {}  # sid -> (namespace, user_id) for sockets waiting in a quick-match queue
+chat_allowance = {}  # (namespace, user id), or sid, -> [tokens, last refill] for the chat rate limit
+chat_outbox = {}  # room -> chat entries waiting for the next batched broadcast
+match_sweeper = None
+hash_pending = 0
+analysis_pending = 0
 
 # --- Models and User Loading ---
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
-    def set_password(self, password): self.password_hash = generate_password_hash(password)
-    def check_password(self, password): return check_password_hash(self.password_hash, password)
+    # Hashing runs on native threads (see run_password_hash) so a login burst never stalls game traffic
+    def set_password(self, password): self.password_hash = run_password_hash(generate_password_hash, password)
+    def check_password(self, password): return run_password_hash(check_password_hash, self.password_hash, password)
 
 class Match(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    player1_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    player2_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    player1_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    player2_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    winner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     is_draw = db.Column(db.Boolean, default=False, nullable=False)
-    timestamp = db.Column(db.DateTime, server_default=db.func.now())
+    timestamp = db.Column(db.DateTime, server_default=db.func.now(), index=True)
+    moves = db.Column(db.LargeBinary, nullable=True)  # one byte per move: board * 9 + cell
     player1 = db.relationship('User', foreign_keys=[player1_id])
     player2 = db.relationship('User', foreign_keys=[player2_id])
     winner = db.relationship('User', foreign_keys=[winner_id])
 
+class UserStats(db.Model):
+    # Maintained incrementally as matches are written, so profiles never count the match table
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    wins = db.Column(db.Integer, default=0, nullable=False)
+    losses = db.Column(db.Integer, default=0, nullable=False)
+    draws = db.Column(db.Integer, default=0, nullable=False)
+    rating = db.Column(db.Float, default=INITIAL_RATING, server_default=str(INITIAL_RATING), nullable=False)
+
 class GuestUser(UserMixin):
     def __init__(self, user_id):
         self.id = user_id
@@ -53,12 +164,376 @@ class GuestUser(UserMixin):
     def is_authenticated(self): return True
     def get_id(self): return self.id
 
+class SocketUser(UserMixin):
+    # The parts of a registered user that socket handlers read, detached from the ORM so it can be cached
+    def __init__(self, user_id, username):
+        self.id = user_id
+        self.username = username
+
+class UserCache:
+    """Bounded LRU of user id -> SocketUser whose entries expire after `ttl` seconds."""
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()  # user id -> (expires at, user)
+
+    def __len__(self): return len(self.entries)
+
+    def get(self, user_id):
+        entry = self.entries.get(user_id)
+        if entry is None: return None
+        if entry[0] < time.monotonic():
+            del self.entries[user_id]; return None
+        self.entries.move_to_end(user_id)
+        return entry[1]
+
+    def put(self, user_id, user):
+        self.entries[user_id] = (time.monotonic() + self.ttl, user)
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_size: self.entries.popitem(last=False)
+
+    def invalidate(self, user_id): self.entries.pop(user_id, None)
+
+# Per worker: invalidate() only reaches this process, USER_CACHE_TTL bounds staleness elsewhere
+user_cache = UserCache(app.config['USER_CACHE_TTL'], app.config['USER_CACHE_SIZE'])
+
 @login_manager.user_loader
 def load_user(user_id):
     if session.get('is_guest'): return GuestUser(session.get('guest_id'))
-    return User.query.get(int(user_id))
+    if not hasattr(request, 'sid'):
+        # Page loads get the full model, and leave the identity cached for the socket that follows
+        user = User.query.get(int(user_id))
+        if user is not None: user_cache.put(user_id, SocketUser(user.id, user.username))
+        return user
+    # Socket events run this for every @login_required handler; only a cache miss reaches the database
+    user = user_cache.get(user_id)
+    USER_CACHE_LOOKUPS.labels('hit' if user else 'miss').inc()
+    if user is None:
+        row = db.session.get(User, int(user_id))
+        if row is None: return None
+        user = SocketUser(row.id, row.username)
+        user_cache.put(user_id, user)
+    return user
+
+# --- Match Recording ---
+class MatchWriter:
+    """Write-behind queue for finished matches.
+
+    Rows are flushed by a background greenlet in batches; a failed batch stays
+    queued and is retried with exponential backoff until it has failed
+    max_attempts times in a row, when it is logged and dropped so one bad row
+    cannot block the queue. drain() flushes what is left at shutdown.
+    """
+    def __init__(self, write_rows, batch_size, interval, max_backoff=30.0, max_attempts=10):
+        self.write_rows = write_rows
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.pending = deque()
+        self.wakeup = threading.Event()
+        self.worker = None
+        self.written = 0
+        self.failures = 0
+        self.attempts = 0  # consecutive failures of the batch at the head of the queue
+        self.dropped = 0
+
+    def submit(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size: self.wakeup.set()
+        if self.worker is None: self.worker = socketio.start_background_task(self.run)
+
+    def flush(self):
+        while self.pending:
+            batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            try:
+                self.write_rows(batch)
+            except Exception:
+                self.attempts += 1
+                if self.attempts < self.max_attempts:
+                    self.pending.extendleft(reversed(batch))
+                else:
+                    self.attempts = 0
+                    self.dropped += len(batch)
+                    app.logger.error("Dropping %d match rows after %d failed attempts: %r", len(batch), self.max_attempts, batch)
+                raise
+            self.attempts = 0
+            self.written += len(batch)
+
+    def run(self):
+        backoff = self.interval
+        while True:
+            self.wakeup.wait(backoff); self.wakeup.clear()
+            try:
+                self.flush()
+                backoff = self.interval
+            except Exception:
+                self.failures += 1
+                app.logger.exception("Match flush failed; %d rows still queued", len(self.pending))
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def drain(self, attempts=3):
+        for attempt in range(attempts):
+            try:
+                self.flush(); return
+            except Exception:
+                self.failures += 1
+                app.logger.exception("Match drain attempt %d failed", attempt + 1)
+                time.sleep(self.interval)
+        app.logger.error("Dropping %d unwritten match rows at shutdown", len(self.pending))
+
+def score_match(stats, row):
+    p1, p2 = stats[row['player1_id']], stats[row['player2_id']]
+    if row['is_draw']:
+        p1.draws += 1; p2.draws += 1; score = 0.5
+    elif row['winner_id'] == p1.user_id:
+        p1.wins += 1; p2.losses += 1; score = 1
+    else:
+        p2.wins += 1; p1.losses += 1; score = 0
+    p1.rating, p2.rating = elo_update(p1.rating, p2.rating, score)
+
+def apply_stats(rows):
+    """Update counts and ratings for a batch of match rows, in order. Returns the touched UserStats."""
+    user_ids = {user_id for row in rows for user_id in (row['player1_id'], row['player2_id'])}
+    # Row locks (where the database has them) keep concurrent writers on other instances from losing updates
+    stats = {s.user_id: s for s in UserStats.query.filter(UserStats.user_id.in_(user_ids)).with_for_update()}
+    for user_id in user_ids - stats.keys():
+        stats[user_id] = UserStats(user_id=user_id, wins=0, losses=0, draws=0, rating=INITIAL_RATING)
+        db.session.add(stats[user_id])
+    for row in rows: score_match(stats, row)
+    return list(stats.values())
+
+def write_matches(rows):
+    global leaderboard
+    with app.app_context():
+        try:
+            db.session.execute(insert(Match), rows)
+            # Read before the commit expires them, which would reload each UserStats with its own SELECT
+            ratings = [(s.user_id, s.rating) for s in apply_stats(rows)]
+            db.session.commit()
+        except Exception:
+            db.session.rollback(); raise
+        # The rows are committed now, so this must not raise into MatchWriter's retry (which would insert them again)
+        try:
+            refresh_leaderboard(ratings)
+        except Exception:
+            app.logger.exception("Leaderboard refresh failed; reloading it on next use")
+            leaderboard = None
+
+# --- Leaderboard ---
+leaderboard = None
+leaderboard_loaded = 0.0
+
+def get_leaderboard():
+    global leaderboard, leaderboard_loaded
+    max_age = app.config['LEADERBOARD_MAX_AGE']
+    if leaderboard is None or (max_age and time.monotonic() - leaderboard_loaded > max_age):
+        board = Leaderboard()
+        ranked = db.session.execute(select(UserStats.user_id, User.username, UserStats.rating).join(User, User.id == UserStats.user_id)
+                                    .where(UserStats.wins + UserStats.losses + UserStats.draws > 0).execution_options(yield_per=1000))
+        for user_id, username, rating in ranked: board.update(user_id, username, rating)
+        leaderboard, leaderboard_loaded = board, time.monotonic()
+    return leaderboard
+
+def refresh_leaderboard(ratings):
+    """Apply (user_id, rating) pairs this worker just committed to its in-memory board."""
+    if leaderboard is None: return  # loaded with these ratings on first use
+    missing = [user_id for user_id, _ in ratings if user_id not in leaderboard.players]
+    usernames = dict(db.session.execute(select(User.id, User.username).where(User.id.in_(missing))).all()) if missing else {}
+    for user_id, rating in ratings:
+        leaderboard.update(user_id, usernames.get(user_id) or leaderboard.players[user_id][1], rating)
+
+@app.cli.command('rebuild-ratings')
+def rebuild_ratings():
+    """Recompute every user's counts and rating from match history in one streaming pass."""
+    global leaderboard
+    stats = {}
+    matches = db.session.execute(select(Match.player1_id, Match.player2_id, Match.winner_id, Match.is_draw)
+                                 .order_by(Match.timestamp, Match.id).execution_options(yield_per=1000))
+    for p1_id, p2_id, winner_id, is_draw in matches:
+        for user_id in (p1_id, p2_id):
+            if user_id not in stats: stats[user_id] = UserStats(user_id=user_id, wins=0, losses=0, draws=0, rating=INITIAL_RATING)
+        score_match(stats, {'player1_id': p1_id, 'player2_id': p2_id, 'winner_id': winner_id, 'is_draw': is_draw})
+    UserStats.query.delete()
+    db.session.add_all(stats.values())
+    db.session.add_all(UserStats(user_id=user_id, wins=0, losses=0, draws=0, rating=INITIAL_RATING)
+                       for (user_id,) in db.session.execute(select(User.id)) if user_id not in stats)
+    db.session.commit()
+    leaderboard = None
+    print(f"Rebuilt ratings for {len(stats)} players")
+
+match_writer = MatchWriter(write_matches, app.config['MATCH_BATCH_SIZE'], app.config['MATCH_FLUSH_INTERVAL'],
+                           max_attempts=app.config['MATCH_MAX_ATTEMPTS'])
+atexit.register(match_writer.drain)
+
+# --- Metrics ---
+# Per-process registry: with several workers, scrape each one (or sum them in Prometheus)
+SOCKET_EVENT_SECONDS = Histogram('uttt_socket_event_seconds', 'Socket.IO handler latency', ['event'],
+                                 buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+SOCKET_EVENT_ERRORS = Counter('uttt_socket_event_errors', 'Socket.IO handlers that raised', ['event'])
+HTTP_REQUEST_SECONDS = Histogram('uttt_http_request_seconds', 'HTTP request latency', ['endpoint'])
+HTTP_REQUEST_ERRORS = Counter('uttt_http_request_errors', 'HTTP requests answered with a 5xx', ['endpoint'])
+QUICK_MATCH_WAIT_SECONDS = Histogram('uttt_quick_match_wait_seconds', 'Time from joining the quick-match queue to being paired',
+                                     buckets=(.1, .5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+USER_CACHE_LOOKUPS = Counter('uttt_user_cache_lookups', 'Socket event user lookups', ['result'])
+LOOP_LAG_SECONDS = Gauge('uttt_event_loop_lag_seconds', 'How late the gevent loop last woke a sleeping greenlet')
+
+def socket_event(name):
+    """socketio.on(name), timing the handler and counting the ones that raise."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                SOCKET_EVENT_ERRORS.labels(name).inc(); raise
+            finally:
+                SOCKET_EVENT_SECONDS.labels(name).observe(time.perf_counter() - start)
+        return socketio.on(name)(timed)
+    return decorator
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    # Also runs for unhandled exceptions, with the 500 response Flask builds for them
+    endpoint = request.endpoint or 'unmatched'
+    if 'request_start' in g: HTTP_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - g.request_start)
+    if response.status_code >= 500: HTTP_REQUEST_ERRORS.labels(endpoint).inc()
+    return response
+
+def monitor_loop_lag():
+    interval = app.config['LOOP_LAG_INTERVAL']
+    while True:
+        start = time.perf_counter()
+        socketio.sleep(interval)
+        LOOP_LAG_SECONDS.set(max(time.perf_counter() - start - interval, 0.0))
+
+def start_loop_monitor():
+    global loop_monitor
+    if loop_monitor is None:
+        loop_monitor = socketio.start_background_task(monitor_loop_lag)
+
+SPECTATOR_BUCKETS = (1, 2, 5, 10, 25, 50, 100)
+ROOM_BYTES_SAMPLE = 50  # rooms per namespace sized on each scrape
+
+class RoomCollector:
+    # Read at scrape time, so nothing is maintained on the hot path
+    def collect(self):
+        rooms = GaugeMetricFamily('uttt_rooms', 'Live rooms', labels=['namespace'])
+        for namespace in NAMESPACES: rooms.add_metric([namespace], store.count(namespace))
+        yield rooms
+        yield GaugeMetricFamily('uttt_active_players', 'Users seated in an unfinished game', value=store.count_user_rooms())
+        waiting = GaugeMetricFamily('uttt_quick_match_waiting', 'Players in the quick-match queue', labels=['namespace'])
+        for namespace in NAMESPACES: waiting.add_metric([namespace], len(match_queues[namespace]))
+        yield waiting
+        yield GaugeMetricFamily('uttt_analysis_cache_positions', 'Position evaluations cached for post-game analysis', value=len(analysis_cache))
+        yield CounterMetricFamily('uttt_rooms_evicted', 'Idle rooms evicted by this worker', value=room_metrics['evicted'])
+        # Sizes from a small sample of rooms: deep_sizeof in memory, the stored JSON length in Redis
+        sizes = [store.room_bytes(namespace, room) for namespace in NAMESPACES
+                 for room in store.sample_rooms(namespace, ROOM_BYTES_SAMPLE)]
+        sizes = [size for size in sizes if size is not None]
+        yield GaugeMetricFamily('uttt_room_bytes_mean', 'Estimated bytes per room, over a sample of rooms', value=sum(sizes) / len(sizes) if sizes else 0)
+        yield GaugeMetricFamily('uttt_room_bytes_max', 'Largest estimated room size in the sample', value=max(sizes, default=0))
+        if 'snapshot_rooms' in room_metrics:
+            yield GaugeMetricFamily('uttt_room_snapshot_rooms', 'Rooms in the last room snapshot', value=room_metrics['snapshot_rooms'])
+            yield GaugeMetricFamily('uttt_room_snapshot_seconds', 'Time taken to write the last room snapshot', value=room_metrics['snapshot_seconds'])
+        sockets = {'player': 0, 'spectator': 0}
+        spectators = {}
+        for namespace, room, role in list(sid_index.values()):
+            sockets[role] += 1
+            if role == 'spectator': spectators[(namespace, room)] = spectators.get((namespace, room), 0) + 1
+        by_role = GaugeMetricFamily('uttt_sockets', 'Sockets in a room on this worker', labels=['role'])
+        for role, count in sockets.items(): by_role.add_metric([role], count)
+        yield by_role
+        # Bucketed rather than labelled by room: room codes are unbounded and should not be published
+        buckets = [(str(bound), sum(1 for count in spectators.values() if count <= bound)) for bound in SPECTATOR_BUCKETS]
+        per_room = HistogramMetricFamily('uttt_room_spectators', 'Spectator sockets per watched room on this worker')
+        per_room.add_metric([], buckets + [('+Inf', len(spectators))], sum_value=sum(spectators.values()))
+        yield per_room
+
+REGISTRY.register(RoomCollector())
+
+# --- Password Hashing ---
+PASSWORD_HASH_WAIT_SECONDS = Histogram('uttt_password_hash_wait_seconds', 'Time a password hash waited for a thread')
+PASSWORD_HASH_SECONDS = Histogram('uttt_password_hash_seconds', 'Time spent computing a password hash')
+PASSWORD_HASH_REJECTED = Counter('uttt_password_hash_rejected', 'Logins and registrations turned away with the hash queue full')
+Gauge('uttt_password_hash_in_flight', 'Password hashes running').set_function(
+    lambda: min(hash_pending, app.config['PASSWORD_HASH_THREADS']))
+Gauge('uttt_password_hash_queue_depth', 'Password hashes waiting for a thread').set_function(
+    lambda: max(hash_pending - app.config['PASSWORD_HASH_THREADS'], 0))
+
+class HashQueueFull(Exception): pass
+
+def get_hash_pool():
+    global hash_pool
+    if hash_pool is None:
+        hash_pool = gevent.threadpool.ThreadPool(app.config['PASSWORD_HASH_THREADS'])
+    return hash_pool
+
+def timed_call(fn, args):
+    # Runs on a native thread: only plain timestamps here, the metrics are updated back on the loop
+    start = time.perf_counter()
+    return fn(*args), start, time.perf_counter()
+
+def run_password_hash(fn, *args):
+    """fn(*args) on the hashing threads; only this greenlet waits (hashlib releases the GIL)."""
+    global hash_pending
+    if hash_pending >= app.config['PASSWORD_HASH_THREADS'] + app.config['PASSWORD_HASH_QUEUE']:
+        PASSWORD_HASH_REJECTED.inc()
+        raise HashQueueFull()
+    hash_pending += 1
+    submitted = time.perf_counter()
+    try:
+        result, start, end = get_hash_pool().apply(timed_call, (fn, args))
+    finally:
+        hash_pending -= 1
+    PASSWORD_HASH_WAIT_SECONDS.observe(start - submitted)
+    PASSWORD_HASH_SECONDS.observe(end - start)
+    return result
+
+@app.errorhandler(HashQueueFull)
+def hash_queue_full(error):
+    flash('Too many sign-ins right now, please try again in a moment.')
+    return redirect(request.path)
+
+@app.route('/metrics')
+def metrics():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+# --- Static Assets ---
+asset_manifest = load_manifest(app.config['ASSET_BUILD_DIR'])
+built_assets = {entry['path']: entry['encodings'] for entry in asset_manifest.values()}
+
+@app.template_global()
+def asset_url(filename):
+    entry = asset_manifest.get(filename)
+    return url_for('asset', filename=entry['path']) if entry else url_for('static', filename=filename)
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    # Names carry a content hash, so the bytes behind a URL never change: cache for good, and
+    # send the precompressed variant the client accepts instead of compressing per request
+    if filename not in built_assets: abort(404)
+    encoding = next((e for e in built_assets[filename] if e in request.accept_encodings), None)
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+    response = send_file(safe_join(app.config['ASSET_BUILD_DIR'], filename + suffix),
+                         mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         etag=f"{filename}-{encoding or 'identity'}")  # each encoding is different bytes
+    if encoding: response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f"public, max-age={app.config['ASSET_MAX_AGE']}, immutable"
+    return response
 
 # --- Routes ---
+@app.context_processor
+def socketio_client():
+    build = 'socket.io.msgpack.min.js' if BINARY_WIRE else 'socket.io.min.js'
+    return {'socketio_client_url': f"https://cdn.socket.io/4.7.2/{build}"}
+
 @app.route('/')
 def landing(): return render_template('landing.html')
 @app.route('/rules')
@@ -89,7 +564,8 @@ def register():
         if User.query.filter_by(username=username).first():
             flash('Username already exists'); return redirect(url_for('register'))
         new_user = User(username=username); new_user.set_password(request.form['password'])
-        db.session.add(new_user); db.session.commit()
+        db.session.add(new_user); db.session.flush()
+        db.session.add(UserStats(user_id=new_user.id, wins=0, losses=0, draws=0, rating=INITIAL_RATING)); db.session.commit()
         login_user(new_user)
         session.pop('is_guest', None); session.pop('guest_id', None)
         return redirect(url_for('home'))
@@ -97,6 +573,7 @@ def register():
 @app.route('/logout')
 @login_required
 def logout():
+    user_cache.invalidate(current_user.get_id())
     logout_user(); session.clear()
     return redirect(url_for('landing'))
 @app.route("/home")
@@ -105,8 +582,7 @@ def home(): return render_template("home.html", is_guest=session.get('is_guest',
 @app.route("/game/<room>")
 @login_required
 def game(room):
-    active_games = get_active_games()
-    if room not in active_games: return render_template("home.html", error="Invalid room code")
+    if not store.exists(current_namespace(), room): return render_template("home.html", error="Invalid room code")
     return render_template("game.html", room=room)
 @app.route("/profile")
 @login_required
@@ -114,216 +590,700 @@ def profile():
     if session.get('is_guest'):
         flash("Guests do not have profiles."); return redirect(url_for('home'))
     user_id = current_user.id
-    wins = Match.query.filter_by(winner_id=user_id).count()
-    draws = Match.query.filter(or_(Match.player1_id == user_id, Match.player2_id == user_id), Match.is_draw==True).count()
-    total_matches = Match.query.filter(or_(Match.player1_id == user_id, Match.player2_id == user_id)).count()
-    losses = total_matches - wins - draws
-    matches = Match.query.filter(or_(Match.player1_id == user_id, Match.player2_id == user_id)).order_by(Match.timestamp.desc()).all()
-    return render_template("profile.html", user=current_user, matches=matches, wins=wins, losses=losses, draws=draws)
+    stats = db.session.get(UserStats, user_id) or UserStats(wins=0, losses=0, draws=0, rating=INITIAL_RATING)
+    matches, next_cursor = match_history(user_id, parse_match_cursor(request.args.get('before')), app.config['MATCH_HISTORY_PAGE_SIZE'])
+    return render_template("profile.html", user=current_user, matches=matches, next_cursor=next_cursor,
+                           wins=stats.wins, losses=stats.losses, draws=stats.draws, rating=round(stats.rating or INITIAL_RATING))
+
+@app.route("/leaderboard")
+def leaderboard_page():
+    board = get_leaderboard()
+    me = current_user.id if current_user.is_authenticated and not session.get('is_guest') else None
+    return render_template("leaderboard.html", players=board.top(app.config['LEADERBOARD_SIZE']),
+                           my_rank=board.rank(me), my_rating=board.players.get(me, (None,))[0])
+
+@app.route("/leaderboard.json")
+def leaderboard_json():
+    board = get_leaderboard()
+    limit = min(request.args.get('limit', app.config['LEADERBOARD_SIZE'], type=int), 500)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    payload = {'players': board.top(limit, offset), 'total': len(board)}
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        payload['user'] = {'user_id': user_id, 'rank': board.rank(user_id),
+                           'rating': round(board.players[user_id][0]) if user_id in board.players else None}
+    return payload
+
+@app.route("/replay/<int:match_id>")
+@login_required
+def replay(match_id):
+    # NDJSON: a header line, then one line per ply, built lazily as the response is sent
+    match = db.session.get(Match, match_id)
+    if match is None or match.moves is None: abort(404)
+    log = bytes(match.moves)
+    start = max(request.args.get('from', 0, type=int), 0)
+    stop = request.args.get('to', type=int)
+    header = {'match_id': match.id, 'player1': match.player1.username, 'player2': match.player2.username,
+              'winner': match.winner.username if match.winner else None, 'is_draw': match.is_draw, 'plies': len(log)}
+    def lines():
+        yield json.dumps(header) + "\n"
+        for ply, move, state in positions(ENGINES[app.config['GAME_ENGINE']], log, start, stop, match_id, replay_cache):
+            yield json.dumps({'ply': ply, 'move': move, 'state': state}) + "\n"
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+def match_history(user_id, before, page_size):
+    """One page of a user's matches, newest first, and the cursor for the next page (None on the last).
+
+    Keyset pagination on the id alone: ids grow in the order matches are recorded, whereas stored timestamps
+    differ in precision (SQLite's server default has whole seconds) and compare unequal to the cursor.
+    """
+    query = Match.query.options(joinedload(Match.player1), joinedload(Match.player2)).filter(
+        or_(Match.player1_id == user_id, Match.player2_id == user_id))
+    if before is not None: query = query.filter(Match.id < before)
+    matches = query.order_by(Match.id.desc()).limit(page_size + 1).all()
+    return matches[:page_size], (matches[page_size - 1].id if len(matches) > page_size else None)
+
+def parse_match_cursor(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 # --- Helper Functions ---
 def new_room(): return ''.join(random.choices(string.digits, k=5))
-def get_active_games(): return guest_games if session.get('is_guest') else games
+def open_room(namespace, game_data):
+    # Codes are random, so retry on the rare collision rather than overwrite a live room
+    while True:
+        room = new_room()
+        if store.create(namespace, room, game_data): return room
+def new_game(): return ENGINES[app.config['GAME_ENGINE']]()
+def current_namespace(): return 'guest' if session.get('is_guest') else 'users'
 
-def emit_game_status(room):
-    game_data = get_active_games().get(room)
-    if not game_data: return
-    base_payload = {
-        'players': {p['symbol']: p['username'] for p in game_data['players'].values()}
+def new_game_data(**carry):
+    game_data = {
+        "game": new_game(), "player_accounts": {}, "account_symbols": {}, "player_sids": {},
+        "players": {}, "spectators": {}, "ready": set(), "rematchReady": set(),
+        "chat_history": deque(maxlen=app.config['CHAT_HISTORY_LIMIT']), "chat_seq": 0, "rematch_declined": False, "seq": 0,
+        "moves": bytearray()
     }
-    all_sids = list(game_data['players'].keys()) + list(game_data['spectators'].keys())
-    for sid in all_sids:
-        status_payload = base_payload.copy()
-        if not game_data['game'].started:
-            if len(game_data['player_accounts']) < 2:
-                status_payload['text'] = "Waiting for an opponent..."
-                status_payload['button_action'] = 'hidden'
-            else:
-                if sid in game_data.get('ready', set()):
-                    status_payload['text'] = "Waiting for opponent to start..."
-                    status_payload['button_action'] = 'waiting'
-                else:
-                    status_payload['text'] = "Opponent has joined! Click start when ready."
-                    status_payload['button_action'] = 'start'
-        elif game_data['game'].game_winner:
-            status_payload['text'] = f"{game_data['game'].game_winner} wins!" if game_data['game'].game_winner != "D" else "Draw!"
-            if game_data.get('rematch_declined'):
-                status_payload['button_rematch'] = 'declined'
-            elif sid in game_data.get('rematchReady', set()):
-                status_payload['button_rematch'] = 'waiting'
-            elif len(game_data.get('rematchReady', set())) > 0:
-                status_payload['button_rematch'] = 'prompted'
+    game_data.update(carry)
+    return game_data
+
+def snapshot(game_data):
+    state = game_data['game'].state()
+    return dict(pack_state(state) if BINARY_WIRE else state, seq=game_data['seq'])
+
+def move_delta(game_data, board, cell, symbol):
+    # Only the mini-board that was played in can change result on a move
+    game = game_data['game']
+    game_data['seq'] += 1
+    delta = {'seq': game_data['seq'], 'board': board, 'cell': cell, 'symbol': symbol,
+             'forced': game.forced_board, 'player': game.current_player, 'gameWinner': game.game_winner}
+    board_winner = game.board_winners[board]
+    if board_winner: delta['boardWinner'] = board_winner
+    return delta
+
+def play_move(namespace, room, game_data, board, cell):
+    # Shared by human and bot moves: apply, log (one byte per move), record a finished game and broadcast
+    game = game_data['game']; symbol = game.current_player
+    if not game.make_move(board, cell): return False
+    game_data['moves'].append(board * 9 + cell)
+    if game.game_winner:
+        record_match(namespace, game_data, game.game_winner)
+    socketio.emit("delta", move_delta(game_data, board, cell, symbol), room=room)
+    emit_game_status(room, game_data)
+    if game.game_winner: start_analysis(namespace, room, game_data)
+    return True
+
+def spectators_room(room): return f"{room}:spectators"
+
+def status_payload(game_data, base_payload, sid=None):
+    # sid=None gives the view of someone who is neither ready nor asking for a rematch, i.e. a spectator
+    payload = base_payload.copy()
+    if not game_data['game'].started:
+        if len(game_data['player_accounts']) < 2:
+            payload['text'] = "Waiting for an opponent..."
+            payload['button_action'] = 'hidden'
+        else:
+            if sid in game_data.get('ready', set()):
+                payload['text'] = "Waiting for opponent to start..."
+                payload['button_action'] = 'waiting'
             else:
-                status_payload['button_rematch'] = 'rematch'
+                payload['text'] = "Opponent has joined! Click start when ready."
+                payload['button_action'] = 'start'
+    elif game_data['game'].game_winner:
+        payload['text'] = f"{game_data['game'].game_winner} wins!" if game_data['game'].game_winner != "D" else "Draw!"
+        if game_data.get('rematch_declined'):
+            payload['button_rematch'] = 'declined'
+        elif sid in game_data.get('rematchReady', set()):
+            payload['button_rematch'] = 'waiting'
+        elif len(game_data.get('rematchReady', set())) > 0:
+            payload['button_rematch'] = 'prompted'
         else:
-            status_payload['text'] = f"Turn: {game_data['game'].current_player}"
-            status_payload['button_action'] = 'resign'
-        emit('gameStatus', status_payload, room=sid)
+            payload['button_rematch'] = 'rematch'
+    else:
+        payload['text'] = f"Turn: {game_data['game'].current_player}"
+        payload['button_action'] = 'resign'
+    return payload
 
-def emit_spectator_list(room):
-    game_data = get_active_games().get(room)
-    if game_data:
-        spectator_list = [spec['username'] for spec in game_data.get('spectators', {}).values()]
-        emit('spectatorList', {'spectators': spectator_list}, room=room)
+def emit_game_status(room, game_data):
+    base_payload = {
+        'players': {p['symbol']: p['username'] for p in game_data['players'].values()}
+    }
+    if game_data.get('bot'): base_payload['players'][game_data['bot']['symbol']] = game_data['bot']['username']
+    # Only the two player sockets get personalised buttons; every spectator shares one broadcast
+    for sid in game_data['players']:
+        socketio.emit('gameStatus', status_payload(game_data, base_payload, sid), room=sid)
+    if game_data['spectators']:
+        socketio.emit('gameStatus', status_payload(game_data, base_payload), room=spectators_room(room))
+
+def emit_spectator_list(room, game_data):
+    spectator_list = [spec['username'] for spec in game_data['spectators'].values()]
+    socketio.emit('spectatorList', {'spectators': spectator_list}, room=room)
+
+# --- Room Lifecycle ---
+def evict_idle_rooms():
+    cutoff = time.time() - app.config['ROOM_IDLE_TTL']
+    evicted = 0
+    for namespace in NAMESPACES:
+        for room in store.idle_rooms(namespace, cutoff):
+            with store.transaction(namespace, room) as game_data:
+                # Rooms that still have sockets are touched on the way out and looked at again later
+                if game_data and (game_data['players'] or game_data['spectators']): continue
+                if game_data:
+                    for user_id in game_data['player_accounts'].values():
+                        if store.get_user_room(user_id) == (namespace, room): store.clear_user_room(user_id)
+                store.delete(namespace, room)
+                evicted += 1
+    room_metrics['evicted'] += evicted
+    return evicted
+
+def sweep_rooms_forever():
+    while True:
+        socketio.sleep(app.config['ROOM_SWEEP_INTERVAL'])
+        try:
+            evict_idle_rooms()
+            prune_chat_allowance()
+        except Exception:
+            app.logger.exception("Idle room sweep failed")
+
+def start_room_sweeper():
+    global room_sweeper
+    if room_sweeper is None:
+        room_sweeper = socketio.start_background_task(sweep_rooms_forever)
+
+# --- Quick Match ---
+def start_match(namespace, first, second, now):
+    """Seat two dequeued players in a new room; re-queue one whose seat was taken meanwhile."""
+    players = [first, second]
+    seated = [player for player in players if store.get_user_room(player["user_id"])]
+    if seated:
+        for player in players:
+            queued_sids.pop(player["sid"], None)
+            if player in seated: socketio.emit("queue_left", room=player["sid"])
+            else: enqueue(namespace, player, now)
+        return None
+    random.shuffle(players)
+    game_data = new_game_data()
+    for symbol, player in zip("XO", players):
+        game_data["player_accounts"][symbol] = player["user_id"]
+        game_data["account_symbols"][player["user_id"]] = symbol
+    room = open_room(namespace, game_data)
+    for player, opponent in (players, players[::-1]):
+        store.set_user_room(player["user_id"], namespace, room)
+        queued_sids.pop(player["sid"], None)
+        QUICK_MATCH_WAIT_SECONDS.observe(now - player["since"])
+        socketio.emit("matched", {"room": room, "opponent": opponent["username"]}, room=player["sid"])
+    start_room_sweeper()
+    return room
+
+def enqueue(namespace, player, now):
+    opponent = match_queues[namespace].add(player, now)
+    if opponent: return start_match(namespace, opponent, player, now)
+    queued_sids[player["sid"]] = (namespace, player["user_id"])
+    socketio.emit("queued", {"waiting": len(match_queues[namespace])}, room=player["sid"])
+    start_match_sweeper()
+    return None
+
+def leave_queue(sid):
+    entry = queued_sids.pop(sid, None)
+    if entry: match_queues[entry[0]].remove(entry[1])
+    return entry is not None
+
+def sweep_match_queues_forever():
+    while True:
+        socketio.sleep(app.config['QUICK_MATCH_SWEEP_INTERVAL'])
+        try:
+            now = time.time()
+            for namespace in NAMESPACES:
+                for first, second in match_queues[namespace].sweep(now): start_match(namespace, first, second, now)
+        except Exception:
+            app.logger.exception("Quick-match sweep failed")
+
+def start_match_sweeper():
+    global match_sweeper
+    if match_sweeper is None:
+        match_sweeper = socketio.start_background_task(sweep_match_queues_forever)
+
+# --- Room Snapshots ---
+def portable_room(game_data):
+    # Sockets do not survive a restart: drop them, keeping ready/rematch flags by user id until the user rejoins
+    sid_users = {sid: player['user_id'] for sid, player in game_data['players'].items()}
+    data = dict(game_data, players={}, player_sids={}, spectators={})
+    data['ready'] = {flag for flag in game_data['ready'] if flag == BOT_ID}
+    data['rematchReady'] = {flag for flag in game_data['rematchReady'] if flag == BOT_ID}
+    data['ready_users'] = game_data.get('ready_users', []) + [sid_users[sid] for sid in game_data['ready'] if sid in sid_users]
+    data['rematch_users'] = game_data.get('rematch_users', []) + [sid_users[sid] for sid in game_data['rematchReady'] if sid in sid_users]
+    return data
+
+def restore_flags(game_data, user_id, sid):
+    for users, flags in (('ready_users', 'ready'), ('rematch_users', 'rematchReady')):
+        if user_id in game_data.get(users, ()):
+            game_data[users].remove(user_id)
+            game_data[flags].add(sid)
+
+def snapshots_enabled(): return bool(app.config['ROOM_SNAPSHOT_PATH']) and isinstance(store, MemoryStore)
+
+def write_room_snapshot(pause=None):
+    if not snapshots_enabled(): return
+    start = time.perf_counter()
+    count = store.write_snapshot(app.config['ROOM_SNAPSHOT_PATH'], ENGINES, portable_room, pause)
+    room_metrics['snapshot_rooms'] = count
+    room_metrics['snapshot_seconds'] = time.perf_counter() - start
+
+def write_snapshots_forever():
+    while True:
+        socketio.sleep(app.config['ROOM_SNAPSHOT_INTERVAL'])
+        try:
+            # Yields between batches of rooms; the shutdown paths below write in one go
+            write_room_snapshot(pause=lambda: socketio.sleep(0))
+        except Exception:
+            app.logger.exception("Room snapshot failed")
+
+def start_snapshot_writer():
+    global snapshot_writer
+    if snapshot_writer is None and snapshots_enabled():
+        snapshot_writer = socketio.start_background_task(write_snapshots_forever)
+
+def install_exit_handlers():
+    # Chains to whatever handled SIGTERM before (gunicorn's graceful shutdown, or the default exit)
+    previous = signal.getsignal(signal.SIGTERM)
+    def on_sigterm(signum, frame):
+        try:
+            write_room_snapshot()
+        except Exception:
+            app.logger.exception("Room snapshot on SIGTERM failed")
+        shutdown_pools()
+        if callable(previous): previous(signum, frame)
+        else: raise SystemExit(0)
+    signal.signal(signal.SIGTERM, on_sigterm)
+    atexit.register(write_room_snapshot)
+    # Registered last so it runs first: the match and snapshot hooks must not wait behind live pool workers
+    atexit.register(shutdown_pools)
+
+if snapshots_enabled() and os.path.exists(app.config['ROOM_SNAPSHOT_PATH']):
+    restore_start = time.perf_counter()
+    restored = store.restore(app.config['ROOM_SNAPSHOT_PATH'], ENGINES, app.config['CHAT_HISTORY_LIMIT'])
+    app.logger.info("Restored %d rooms in %.3fs", restored, time.perf_counter() - restore_start)
+    # Restored rooms go idle like any other; do not wait for the next create to start evicting them
+    if restored: start_room_sweeper()
+# With the worker rather than on its first request: a restarted worker keeps snapshotting before anyone reconnects
+start_snapshot_writer()
+start_loop_monitor()
+
+# --- Bot Opponent ---
+# Think time is the search itself; queue wait is the rest of the round trip, mostly waiting for a free worker
+BOT_MOVES = Counter('uttt_bot_moves', 'Bot moves played', ['source'])
+BOT_THINK_SECONDS = Histogram('uttt_bot_think_seconds', 'Bot search time per move', buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5))
+BOT_QUEUE_WAIT_SECONDS = Histogram('uttt_bot_queue_wait_seconds', 'Time a bot search spent outside the search (pool queue, pickling)')
+Gauge('uttt_bot_workers', 'Bot search processes').set_function(lambda: app.config['BOT_WORKERS'])
+
+def get_bot_pool():
+    # Spawned (not forked) workers so the search processes never inherit the gevent hub
+    global bot_pool
+    if bot_pool is None:
+        bot_pool = ProcessPoolExecutor(max_workers=app.config['BOT_WORKERS'], mp_context=multiprocessing.get_context('spawn'))
+    return bot_pool
+
+def shutdown_pools():
+    # Otherwise the spawned workers and multiprocessing's resource tracker outlive the server
+    global bot_pool, analysis_pool
+    for pool in (bot_pool, analysis_pool):
+        if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+    bot_pool = analysis_pool = None
+
+install_exit_handlers()
+
+def get_position_book():
+    global position_book
+    if position_book is None and app.config['BOOK_PATH'] and os.path.exists(app.config['BOOK_PATH']):
+        position_book = PositionBook(app.config['BOOK_PATH'])
+    return position_book
+
+def book_move(game):
+    book = get_position_book()
+    entry = book.lookup(game) if book else None
+    if entry and entry['board'] is not None: return entry['board'], entry['cell']
+    return None
+
+def bot_turn(namespace, room):
+    with store.transaction(namespace, room) as game_data:
+        # A rejoin can start a second turn while one is in flight: only one of them finds the bot still to move
+        if not game_data or not bot_to_move(game_data): return
+        known = book_move(game_data['game'])
+        if known and play_move(namespace, room, game_data, *known):
+            BOT_MOVES.labels('book').inc(); return
+        state, seq, budget = game_data['game'].state(), game_data['seq'], game_data['bot']['budget']
+    # Search without holding the room, then re-check it was not rematched, resigned or evicted meanwhile
+    submitted = time.perf_counter()
+    result = get_bot_pool().submit(mcts.search, state, **budget).result()
+    elapsed = time.perf_counter() - submitted
+    BOT_MOVES.labels('search').inc()
+    BOT_THINK_SECONDS.observe(result['think_time'] if result else 0.0)
+    BOT_QUEUE_WAIT_SECONDS.observe(elapsed - (result['think_time'] if result else 0.0))
+    if not result: return
+    with store.transaction(namespace, room) as game_data:
+        if not game_data or game_data['seq'] != seq: return
+        play_move(namespace, room, game_data, result['board'], result['cell'])
+
+def bot_to_move(game_data):
+    game = game_data['game']
+    return bool(game_data.get('bot')) and game.started and not game.game_winner and game.current_player == game_data['bot']['symbol']
+
+def maybe_start_bot_turn(namespace, room, game_data):
+    if bot_to_move(game_data): socketio.start_background_task(bot_turn, namespace, room)
+
+# --- Post-game Analysis ---
+ANALYSIS_POSITIONS = Counter('uttt_analysis_positions', 'Positions evaluated for post-game analysis', ['result'])
+ANALYSIS_SKIPPED = Counter('uttt_analysis_skipped', 'Finished games not analysed because ANALYSIS_MAX_PENDING were already in progress')
+Gauge('uttt_analysis_pending', 'Finished games being analysed or waiting for a worker').set_function(lambda: analysis_pending)
+ANALYSIS_SECONDS = Histogram('uttt_analysis_seconds', 'Time from the end of a game to its last analysed move',
+                             buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+
+def get_analysis_pool():
+    # Separate from the bot pool, so a backlog of finished games never holds up a bot's move
+    global analysis_pool
+    if analysis_pool is None:
+        analysis_pool = ProcessPoolExecutor(max_workers=app.config['ANALYSIS_WORKERS'], mp_context=multiprocessing.get_context('spawn'))
+    return analysis_pool
+
+def analysis_positions(log):
+    """(position_key, symmetry, state) for each position of a move log, the empty board first."""
+    game = BitboardUltimateTicTacToe(); game.started = True
+    found = [(*canonical_key(game), game.state())]
+    for move in log:
+        game.make_move(*divmod(move, 9))
+        found.append((*canonical_key(game), game.state()))
+    return found
+
+def analyse_game(room, seq, log):
+    global analysis_pending
+    try:
+        stream_analysis(room, seq, log)
+    except Exception:
+        app.logger.exception("Analysis of room %s failed", room)
+    finally:
+        analysis_pending -= 1
+
+def stream_analysis(room, seq, log):
+    # Cached positions are answered at once and the rest searched in the pool; each move is reported as soon as
+    # the positions either side of it are known. Events carry the game's final seq so clients drop them after a rematch
+    started = time.perf_counter()
+    depth, threshold = app.config['ANALYSIS_DEPTH'], app.config['ANALYSIS_BLUNDER_THRESHOLD']
+    found = analysis_positions(log)
+    evals, futures = {}, {}
+    for ply, (key, symmetry, state) in enumerate(found):
+        cached = analysis_cache.get(key, symmetry)
+        if cached: evals[ply] = cached
+        else: futures[get_analysis_pool().submit(analysis.evaluate, state, depth)] = ply
+    ANALYSIS_POSITIONS.labels('cached').inc(len(evals))
+    ANALYSIS_POSITIONS.labels('searched').inc(len(futures))
+    blunders = {'X': 0, 'O': 0}
+
+    def report(ply):
+        if not 0 < ply <= len(log) or ply - 1 not in evals or ply not in evals: return
+        board, cell = divmod(log[ply - 1], 9)
+        symbol = 'X' if ply % 2 else 'O'
+        verdict = analysis.judge(evals[ply - 1], evals[ply], threshold)
+        blunders[symbol] += verdict['blunder']
+        socketio.emit('analysis', dict(verdict, seq=seq, ply=ply, board=board, cell=cell, symbol=symbol), room=room)
+
+    for ply in range(1, len(log) + 1): report(ply)
+    for future in as_completed(futures):
+        ply = futures[future]
+        evals[ply] = future.result()
+        key, symmetry, _ = found[ply]
+        analysis_cache.put(key, symmetry, evals[ply])
+        report(ply); report(ply + 1)
+    ANALYSIS_SECONDS.observe(time.perf_counter() - started)
+    socketio.emit('analysisDone', {'seq': seq, 'moves': len(log), 'blunders': blunders}, room=room)
+
+def start_analysis(namespace, room, game_data):
+    # Only rated games long enough to have been played out, with a player still here to read the result. At most
+    # ANALYSIS_MAX_PENDING games are searched or waiting at once; past that a game is skipped, not queued, so
+    # results never arrive long after the players have moved on
+    global analysis_pending
+    if namespace == 'guest' or len(game_data['moves']) < app.config['ANALYSIS_MIN_MOVES'] or not game_data['players']: return
+    if analysis_pending >= app.config['ANALYSIS_MAX_PENDING']:
+        ANALYSIS_SKIPPED.inc(); return
+    analysis_pending += 1
+    socketio.start_background_task(analyse_game, room, game_data['seq'], bytes(game_data['moves']))
 
 # --- SocketIO Events ---
-@socketio.on("create")
+@socket_event("create")
 @login_required
-def create():
-    if current_user.get_id() in active_players:
+def create(data=None):
+    if store.get_user_room(current_user.get_id()):
         emit('already_in_game', {'error': 'You are already in a game.'}); return
-    active_games = get_active_games()
-    room = new_room()
-    active_games[room] = { "game": UltimateTicTacToe(), "player_accounts": {}, "players": {}, "spectators": {}, "ready": set(), "rematchReady": set(), "chat_history": [], "rematch_declined": False }
+    game_data = new_game_data()
+    level = (data or {}).get('bot')
+    if level in app.config['BOT_LEVELS']:
+        # The bot holds the O seat and is always ready
+        game_data["bot"] = {"symbol": "O", "username": f"Bot ({level})", "budget": app.config['BOT_LEVELS'][level]}
+        game_data["player_accounts"]["O"] = BOT_ID
+        game_data["account_symbols"][BOT_ID] = "O"
+        game_data["ready"].add(BOT_ID)
+    room = open_room(current_namespace(), game_data)
+    start_room_sweeper()
     emit("created", room)
 
-@socketio.on("join")
+@socket_event("join")
 @login_required
 def join(data):
-    active_games = get_active_games()
-    room = data["room"]; sid = request.sid
-    game_data = active_games.get(room)
-    if not game_data: emit("invalid"); return
-    user_id = current_user.get_id()
-    is_locked_player = user_id in game_data.get("player_accounts", {}).values()
-    if not is_locked_player and user_id in active_players:
-        emit('already_in_game', {'error': 'You are already in another game.'}); return
-    join_room(room)
-    players = game_data["players"]
-    player_accounts = game_data["player_accounts"]
-    if is_locked_player:
-        symbol = next(s for s, uid in player_accounts.items() if uid == user_id)
-        old_sid = next((s for s, p in players.items() if p.get('user_id') == user_id), None)
-        if old_sid: del players[old_sid]
-        players[sid] = {"symbol": symbol, "user_id": user_id, "username": current_user.username}
-        emit("assign", symbol)
-    elif len(player_accounts) < 2:
-        symbol = "X" if "X" not in player_accounts else "O"
-        player_accounts[symbol] = user_id
-        players[sid] = {"symbol": symbol, "user_id": user_id, "username": current_user.username}
-        active_players.add(user_id)
-        emit("assign", symbol)
-    else:
-        game_data["spectators"][sid] = {"user_id": user_id, "username": current_user.username}
-        emit("spectator")
-    if game_data.get("chat_history"): emit('chatHistory', {'history': game_data["chat_history"]})
-    emit("state", game_data["game"].state(), room=room)
-    emit_game_status(room)
-    emit_spectator_list(room)
-
-def record_match(game_data, winner_symbol):
-    for user_id in game_data["player_accounts"].values(): active_players.discard(user_id)
-    if session.get('is_guest') or len(game_data["player_accounts"]) < 2: return
-    p1_id = game_data["player_accounts"]["X"]; p2_id = game_data["player_accounts"]["O"]
-    if winner_symbol == "D":
-        match = Match(player1_id=p1_id, player2_id=p2_id, winner_id=None, is_draw=True)
-    else:
-        winner_id = game_data["player_accounts"][winner_symbol]
-        match = Match(player1_id=p1_id, player2_id=p2_id, winner_id=winner_id, is_draw=False)
-    db.session.add(match); db.session.commit()
+    room = data["room"]; sid = request.sid; namespace = current_namespace()
+    with store.transaction(namespace, room) as game_data:
+        if not game_data: emit("invalid"); return
+        user_id = current_user.get_id()
+        is_locked_player = user_id in game_data["account_symbols"]
+        if not is_locked_player and store.get_user_room(user_id):
+            emit('already_in_game', {'error': 'You are already in another game.'}); return
+        join_room(room)
+        players = game_data["players"]
+        player_accounts = game_data["player_accounts"]
+        if is_locked_player:
+            symbol = game_data["account_symbols"][user_id]
+            old_sid = game_data["player_sids"].get(user_id)
+            if old_sid: players.pop(old_sid, None); sid_index.pop(old_sid, None)
+            players[sid] = {"symbol": symbol, "user_id": user_id, "username": current_user.username}
+            game_data["player_sids"][user_id] = sid
+            sid_index[sid] = (namespace, room, 'player')
+            restore_flags(game_data, user_id, sid)
+            emit("assign", symbol)
+            # A bot room restored from a snapshot on the bot's move has no search running
+            maybe_start_bot_turn(namespace, room, game_data)
+        elif len(player_accounts) < 2:
+            symbol = "X" if "X" not in player_accounts else "O"
+            player_accounts[symbol] = user_id
+            game_data["account_symbols"][user_id] = symbol
+            players[sid] = {"symbol": symbol, "user_id": user_id, "username": current_user.username}
+            game_data["player_sids"][user_id] = sid
+            sid_index[sid] = (namespace, room, 'player')
+            store.set_user_room(user_id, namespace, room)
+            emit("assign", symbol)
+        else:
+            game_data["spectators"][sid] = {"user_id": user_id, "username": current_user.username}
+            sid_index[sid] = (namespace, room, 'spectator')
+            join_room(spectators_room(room))
+            emit("spectator")
+        emit_chat_history(game_data, data.get("chat_after"))
+        emit("state", snapshot(game_data))
+        emit_game_status(room, game_data)
+        emit_spectator_list(room, game_data)
 
-@socketio.on("ready")
+def record_match(namespace, game_data, winner_symbol):
+    for user_id in game_data["player_accounts"].values(): store.clear_user_room(user_id)
+    if game_data.get('bot') or namespace == 'guest' or len(game_data["player_accounts"]) < 2: return
+    p1_id = int(game_data["player_accounts"]["X"]); p2_id = int(game_data["player_accounts"]["O"])
+    winner_id = None if winner_symbol == "D" else int(game_data["player_accounts"][winner_symbol])
+    match_writer.submit({'player1_id': p1_id, 'player2_id': p2_id, 'winner_id': winner_id,
+                         'is_draw': winner_symbol == "D", 'timestamp': datetime.utcnow(), 'moves': bytes(game_data['moves'])})
+
+@socket_event("ready")
 @login_required
 def ready(data):
-    active_games = get_active_games(); room = data["room"]; sid = request.sid
-    game_data = active_games.get(room)
-    if not game_data or sid not in game_data["players"]: return
-    game_data["ready"].add(sid)
-    if len(game_data["player_accounts"]) == 2 and len(game_data["ready"]) == 2:
-        game_data["game"].started = True
-        emit("state", game_data["game"].state(), room=room)
-    emit_game_status(room)
-
-@socketio.on("rematch")
+    room = data["room"]; sid = request.sid; namespace = current_namespace()
+    with store.transaction(namespace, room) as game_data:
+        if not game_data or sid not in game_data["players"]: return
+        game_data["ready"].add(sid)
+        if len(game_data["player_accounts"]) == 2 and len(game_data["ready"]) == 2:
+            game_data["game"].started = True
+            emit("state", snapshot(game_data), room=room)
+            maybe_start_bot_turn(namespace, room, game_data)
+        emit_game_status(room, game_data)
+
+@socket_event("rematch")
 @login_required
 def rematch(data):
-    active_games = get_active_games(); room = data["room"]; sid = request.sid
-    game_data = active_games.get(room)
-    if not game_data or sid not in game_data["players"] or game_data.get('rematch_declined'): return
-    game_data["rematchReady"].add(sid)
-    if len(game_data["rematchReady"]) == 2:
-        player_accounts = game_data["player_accounts"]
-        active_games[room] = {
-            "game": UltimateTicTacToe(), "player_accounts": player_accounts,
-            "players": game_data["players"], "spectators": game_data["spectators"],
-            "ready": set(), "rematchReady": set(), "chat_history": game_data.get("chat_history", []), "rematch_declined": False
-        }
-        emit("rematchAgreed", room=room)
-        emit("state", active_games[room]["game"].state(), room=room)
-    emit_game_status(room)
+    room = data["room"]; sid = request.sid; namespace = current_namespace()
+    with store.transaction(namespace, room) as game_data:
+        if not game_data or sid not in game_data["players"] or game_data.get('rematch_declined'): return
+        game_data["rematchReady"].add(sid)
+        if game_data.get('bot'): game_data["rematchReady"].add(BOT_ID)
+        if len(game_data["rematchReady"]) == 2:
+            # Reset in place (the store writes this dict back); seq moves on so stale bot results are dropped
+            game_data.update(new_game_data(
+                player_accounts=game_data["player_accounts"], account_symbols=game_data["account_symbols"],
+                player_sids=game_data["player_sids"], players=game_data["players"], spectators=game_data["spectators"],
+                chat_history=game_data["chat_history"], chat_seq=game_data["chat_seq"], seq=game_data["seq"] + 1
+            ))
+            for user_id in game_data["player_accounts"].values():
+                if user_id != BOT_ID: store.set_user_room(user_id, namespace, room)
+            if game_data.get('bot'): game_data["ready"].add(BOT_ID)
+            emit("rematchAgreed", room=room)
+            emit("state", snapshot(game_data), room=room)
+        emit_game_status(room, game_data)
 
-@socketio.on("leave_post_game")
+@socket_event("leave_post_game")
 @login_required
 def leave_post_game(data):
-    active_games = get_active_games(); room = data["room"]
-    game_data = active_games.get(room)
-    if not game_data: return
-    game_data['rematch_declined'] = True
-    emit_game_status(room)
+    room = data["room"]
+    with store.transaction(current_namespace(), room) as game_data:
+        if not game_data: return
+        game_data['rematch_declined'] = True
+        emit_game_status(room, game_data)
+
+@socket_event("quick_match")
+@login_required
+def quick_match(data=None):
+    user_id = current_user.get_id(); namespace = current_namespace()
+    if store.get_user_room(user_id):
+        emit('already_in_game', {'error': 'You are already in a game.'}); return
+    previous = match_queues[namespace].remove(user_id)  # queued from another tab: that socket gives up its place
+    if previous and queued_sids.pop(previous["sid"], None): socketio.emit("queue_left", room=previous["sid"])
+    rating = INITIAL_RATING if namespace == 'guest' else get_leaderboard().players.get(int(user_id), (INITIAL_RATING,))[0]
+    now = time.time()
+    enqueue(namespace, {"user_id": user_id, "rating": rating, "since": now, "sid": request.sid,
+                        "username": current_user.username}, now)
 
-@socketio.on('disconnect')
+@socket_event("quick_match_cancel")
+def quick_match_cancel():
+    if leave_queue(request.sid): emit("queue_left")
+
+@socket_event('disconnect')
 def disconnect():
-    sid = request.sid
-    for g in [games, guest_games]:
-        for room, game_data in list(g.items()):
-            if sid in game_data.get("players", {}):
-                del game_data["players"][sid]
-                if game_data['game'].game_winner:
-                    game_data['rematch_declined'] = True
-                emit_game_status(room)
-                return
-            elif sid in game_data.get("spectators", {}):
-                del game_data["spectators"][sid]
-                leave_room(room)
-                emit_spectator_list(room)
-                return
-
-@socketio.on('chat')
+    leave_queue(request.sid)
+    chat_allowance.pop(request.sid, None)
+    entry = sid_index.pop(request.sid, None)
+    if not entry: return
+    namespace, room, role = entry
+    with store.transaction(namespace, room) as game_data:
+        if not game_data: return
+        if role == 'player':
+            player = game_data["players"].pop(request.sid, None)
+            if player and game_data["player_sids"].get(player["user_id"]) == request.sid:
+                del game_data["player_sids"][player["user_id"]]
+            if game_data['game'].game_winner:
+                game_data['rematch_declined'] = True
+            emit_game_status(room, game_data)
+        else:
+            game_data["spectators"].pop(request.sid, None)
+            leave_room(room); leave_room(spectators_room(room))
+            emit_spectator_list(room, game_data)
+
+# --- Chat ---
+def emit_chat_history(game_data, after):
+    """Send this socket the messages after id `after` (its last seen), or the whole
+    bounded history with reset=True when that cursor is unknown or too old."""
+    history = game_data["chat_history"]
+    oldest = history[0]['id'] if history else game_data["chat_seq"] + 1
+    if isinstance(after, int) and oldest - 1 <= after <= game_data["chat_seq"]:
+        entries = [entry for entry in history if entry['id'] > after]
+        if entries: emit('chatHistory', {'history': entries, 'reset': False})
+    elif history or after:
+        emit('chatHistory', {'history': list(history), 'reset': True})
+
+def chat_key():
+    # Per account, so a second tab does not double the allowance; the socket for anyone not logged in
+    if current_user.is_authenticated: return (current_namespace(), current_user.get_id())
+    return request.sid
+
+def allow_chat(key):
+    limit, window = app.config['CHAT_RATE_LIMIT'], app.config['CHAT_RATE_WINDOW']
+    now = time.monotonic()
+    tokens, last = chat_allowance.get(key, (limit, now))
+    tokens = min(limit, tokens + (now - last) * limit / window)
+    if tokens < 1:
+        chat_allowance[key] = [tokens, now]; return False
+    chat_allowance[key] = [tokens - 1, now]
+    return True
+
+def prune_chat_allowance():
+    # A bucket left alone for a whole window is full again, the same as having none
+    cutoff = time.monotonic() - app.config['CHAT_RATE_WINDOW']
+    for key in [key for key, (_, last) in chat_allowance.items() if last <= cutoff]: del chat_allowance[key]
+
+def queue_chat(room, entry):
+    # The first message into an empty outbox schedules the flush; later ones ride along
+    pending = chat_outbox.setdefault(room, [])
+    pending.append(entry)
+    if len(pending) == 1: socketio.start_background_task(flush_chat, room)
+
+def flush_chat(room):
+    socketio.sleep(app.config['CHAT_FLUSH_INTERVAL'])
+    messages = chat_outbox.pop(room, None)
+    if messages: socketio.emit('chatMessages', {'messages': messages}, room=room)
+
+@socket_event('chat')
 @login_required
 def chat(data):
-    room = data['room']; message = data['message']; username = current_user.username
-    game_data = get_active_games().get(room)
-    if not game_data: return
-    
-    is_spectator = request.sid in game_data['spectators']
-    player_symbol = None
-    if not is_spectator:
-        player_data = game_data['players'].get(request.sid)
-        if player_data:
-            player_symbol = player_data['symbol']
-
-    chat_entry = {
-        'username': username, 
-        'message': message, 
-        'is_spectator': is_spectator,
-        'symbol': player_symbol
-    }
-    game_data["chat_history"].append(chat_entry)
-    emit('chatMessage', chat_entry, room=room)
+    room = data['room']; message = str(data['message'])[:app.config['CHAT_MAX_LENGTH']]; username = current_user.username
+    if not message.strip(): return
+    if not allow_chat(chat_key()):
+        emit('chatError', {'error': 'You are sending messages too quickly.'}); return
+    with store.transaction(current_namespace(), room) as game_data:
+        if not game_data: return
+
+        is_spectator = request.sid in game_data['spectators']
+        player_symbol = None
+        if not is_spectator:
+            player_data = game_data['players'].get(request.sid)
+            if player_data:
+                player_symbol = player_data['symbol']
+
+        game_data["chat_seq"] += 1
+        chat_entry = {
+            'id': game_data["chat_seq"],
+            'username': username,
+            'message': message,
+            'is_spectator': is_spectator,
+            'symbol': player_symbol
+        }
+        game_data["chat_history"].append(chat_entry)
+    queue_chat(room, chat_entry)
 
-@socketio.on("move")
+@socket_event("move")
 @login_required
 def move(data):
-    game_data = get_active_games().get(data["room"])
-    if not game_data: return
-    game = game_data["game"]
-    if game.make_move(data["board"], data["cell"]):
-        if game.game_winner:
-            record_match(game_data, game.game_winner)
-        emit("state", game.state(), room=data["room"])
-        emit_game_status(data["room"])
-
-@socketio.on("resign")
+    room = data["room"]; namespace = current_namespace()
+    with store.transaction(namespace, room) as game_data:
+        if not game_data: return
+        game = game_data["game"]
+        if game_data.get('bot') and game.current_player == game_data['bot']['symbol']: return
+        if play_move(namespace, room, game_data, data["board"], data["cell"]):
+            maybe_start_bot_turn(namespace, room, game_data)
+
+@socket_event("resign")
 @login_required
 def resign(data):
-    game_data = get_active_games().get(data["room"])
+    room = data["room"]; namespace = current_namespace()
+    with store.transaction(namespace, room) as game_data:
+        if not game_data: return
+        game = game_data["game"]; loser_symbol = data["symbol"]
+        winner_symbol = "X" if loser_symbol == "O" else "O"
+        game.resign(loser_symbol)
+        game_data["seq"] += 1
+        record_match(namespace, game_data, winner_symbol)
+        emit("state", snapshot(game_data), room=room)
+        emit_game_status(room, game_data)
+        start_analysis(namespace, room, game_data)
+
+@socket_event("sync")
+@login_required
+def sync(data):
+    # Clients ask for a full snapshot when they detect a gap in delta sequence numbers
+    game_data = store.get(current_namespace(), data["room"])
     if not game_data: return
-    game = game_data["game"]; loser_symbol = data["symbol"]
-    winner_symbol = "X" if loser_symbol == "O" else "O"
-    game.resign(loser_symbol)
-    record_match(game_data, winner_symbol)
-    emit("state", game.state(), room=data["room"])
-    emit_game_status(data["room"])
+    emit("state", snapshot(game_data))
 
 if __name__ == "__main__":
     socketio.run(app, debug=True)
@@ -0,0 +1,165 @@
+"""Engine micro-benchmarks and perft correctness checks.
+
+bench times make_move, check_win, check_game_winner and state() over a fixed
+corpus of random games (same --seed, same corpus), so runs before and after an
+engine change are comparable. Methods an engine does not have are reported as
+null.
+
+perft counts the leaf nodes reachable in exactly N plies from each position in
+bench/perft_fixtures.json and compares them with the checked-in reference
+counts. Moves are generated from state() by the rules, not by the engine, so
+a bug in the engine's move handling shows up as a count mismatch. Positions are
+stored as hex move logs (one byte per move, board * 9 + cell).
+
+    python bench/engine_bench.py bench --engine list --games 2000 --out bench.json
+    python bench/engine_bench.py perft --engine bitboard
+    python bench/engine_bench.py perft --update   # after adding a fixture position
+"""
+import argparse, json, os, random, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from game.logic import UltimateTicTacToe
+from game.bitboard import BitboardUltimateTicTacToe
+
+ENGINES = {"list": UltimateTicTacToe, "bitboard": BitboardUltimateTicTacToe}
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perft_fixtures.json")
+
+def legal_moves(state):
+    if not state["started"] or state["gameWinner"]: return []
+    boards = [state["forced"]] if state["forced"] is not None else [b for b in range(9) if state["winners"][b] is None]
+    return [(b, c) for b in boards for c in range(9) if state["boards"][b][c] is None]
+
+def from_log(engine, log):
+    game = engine(); game.started = True
+    for move in log:
+        if not game.make_move(*divmod(move, 9)): raise ValueError(f"illegal move {divmod(move, 9)} in fixture")
+    return game
+
+def perft(engine, game, depth):
+    if depth == 0: return 1
+    state = game.state()
+    moves = legal_moves(state)
+    if depth == 1: return len(moves)
+    total = 0
+    for b, c in moves:
+        child = engine.from_state(state)
+        child.make_move(b, c)
+        total += perft(engine, child, depth - 1)
+    return total
+
+def random_corpus(games, seed):
+    """Move logs of `games` uniformly random games."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(games):
+        game = BitboardUltimateTicTacToe(); game.started = True
+        log = bytearray()
+        while not game.game_winner:
+            b, c = rng.choice(game.legal_moves())
+            game.make_move(b, c); log.append(b * 9 + c)
+        corpus.append(bytes(log))
+    return corpus
+
+def timed(fn, ops):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"ops": ops, "seconds": round(elapsed, 4), "ops_per_second": round(ops / elapsed, 1) if elapsed else None}
+
+def bench(engine, corpus, repeat):
+    results = {}
+    moves = sum(len(log) for log in corpus)
+    def replay():
+        for _ in range(repeat):
+            for log in corpus:
+                game = engine(); game.started = True
+                for move in log: game.make_move(*divmod(move, 9))
+    results["make_move"] = timed(replay, moves * repeat)
+
+    # Every position in the corpus, once, as live engine objects
+    positions = []
+    for log in corpus:
+        game = engine(); game.started = True
+        for move in log:
+            game.make_move(*divmod(move, 9))
+            positions.append(engine.from_state(game.state()))
+
+    if hasattr(engine, "check_win"):
+        boards = [board for game in positions[::9] for board in game.boards]
+        probe = positions[0]
+        def check_win():
+            for _ in range(repeat):
+                for board in boards: probe.check_win(board)
+        results["check_win"] = timed(check_win, len(boards) * repeat)
+    else:
+        results["check_win"] = None
+
+    if hasattr(engine, "check_game_winner"):
+        def check_game_winner():
+            for _ in range(repeat):
+                for game in positions: game.check_game_winner()
+        results["check_game_winner"] = timed(check_game_winner, len(positions) * repeat)
+    else:
+        results["check_game_winner"] = None
+
+    def state():
+        for _ in range(repeat):
+            for game in positions: game.state()
+    results["state"] = timed(state, len(positions) * repeat)
+    return results
+
+def run_perft(engine, fixtures, max_depth=None):
+    results, mismatches = [], 0
+    for fixture in fixtures:
+        game = from_log(engine, bytes.fromhex(fixture["moves"]))
+        for depth, expected in enumerate(fixture["counts"], start=1):
+            if max_depth is not None and depth > max_depth: break
+            start = time.perf_counter()
+            nodes = perft(engine, game, depth)
+            elapsed = time.perf_counter() - start
+            ok = nodes == expected
+            mismatches += not ok
+            results.append({"position": fixture["name"], "depth": depth, "nodes": nodes, "expected": expected, "ok": ok,
+                            "seconds": round(elapsed, 4), "nodes_per_second": round(nodes / elapsed, 1) if elapsed else None})
+    return results, mismatches
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="time engine methods on a random game corpus")
+    b.add_argument("--games", type=int, default=2000)
+    b.add_argument("--repeat", type=int, default=3)
+    b.add_argument("--seed", type=int, default=1)
+    p = sub.add_parser("perft", help="check leaf counts against bench/perft_fixtures.json")
+    p.add_argument("--max-depth", type=int, help="skip fixture depths above this")
+    p.add_argument("--update", action="store_true", help="recompute and rewrite the reference counts")
+    for cmd in (b, p):
+        cmd.add_argument("--engine", choices=ENGINES, default="list")
+        cmd.add_argument("--out", help="also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+    engine = ENGINES[args.engine]
+
+    with open(FIXTURES) as f: fixtures = json.load(f)
+    status = 0
+    if args.command == "bench":
+        corpus = random_corpus(args.games, args.seed)
+        report = {"engine": args.engine, "games": args.games, "seed": args.seed, "repeat": args.repeat,
+                  "results": bench(engine, corpus, args.repeat)}
+        print(json.dumps(report))
+    elif args.update:
+        for fixture in fixtures:
+            game = from_log(engine, bytes.fromhex(fixture["moves"]))
+            fixture["counts"] = [perft(engine, game, depth) for depth in range(1, fixture["depth"] + 1)]
+        with open(FIXTURES, "w") as f: json.dump(fixtures, f, indent=2); f.write("\n")
+        report = {"engine": args.engine, "updated": [fixture["name"] for fixture in fixtures]}
+        print(json.dumps(report))
+    else:
+        results, mismatches = run_perft(engine, fixtures, args.max_depth)
+        report = {"engine": args.engine, "results": results, "mismatches": mismatches}
+        print(json.dumps(report))
+        status = 1 if mismatches else 0
+    if args.out:
+        with open(args.out, "w") as f: json.dump(report, f, indent=2)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Socket.IO load test against a running app.py server.
+
+Starts the app in a subprocess (or targets --url), then ramps up rooms of two
+simulated guests each: every client logs in through /guest, connects with
+python-socketio, creates/joins a room, readies up and plays random legal
+moves, asking for a rematch whenever a game ends. After each ramp step the
+load is held for --duration seconds and one JSON line is printed with the
+move -> delta round trip percentiles, events received per second and the
+server's RSS. --out also writes the whole run as one JSON document.
+
+Needs the python-socketio client extras (requests, websocket-client).
+
+    python bench/loadtest.py --rooms 50 200 500 1000 --duration 20 --out before.json
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import argparse, json, os, random, socket, subprocess, sys, tempfile, time
+import gevent, gevent.event, gevent.pool, requests, socketio
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from game.bitboard import BitboardUltimateTicTacToe
+from game.wire import unpack_state
+
+def percentile(values, q):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class Stats:
+    def __init__(self): self.reset()
+    def reset(self):
+        self.latencies, self.events, self.moves, self.games, self.errors = [], 0, 0, 0, 0
+        self.started = time.perf_counter()
+
+class Player:
+    """One guest: its own HTTP session (for the login cookie) and socket."""
+    def __init__(self, url, stats, rng, think, serializer="default"):
+        self.url, self.stats, self.rng, self.think = url, stats, rng, think
+        self.http = requests.Session()
+        self.sio = socketio.Client(reconnection=False, http_session=self.http, handle_sigint=False, serializer=serializer)
+        self.room = self.symbol = None
+        self.game = BitboardUltimateTicTacToe()
+        self.sent_at = None
+        self.created = gevent.event.AsyncResult()
+        for name in ("state", "delta", "created", "assign", "gameStatus", "spectatorList", "rematchAgreed", "chatHistory"):
+            self.sio.on(name, getattr(self, f"on_{name}", self.on_other))
+
+    def connect(self):
+        self.http.get(f"{self.url}/guest", allow_redirects=False).raise_for_status()
+        self.sio.connect(self.url, transports=["websocket"])
+
+    def on_other(self, *args): self.stats.events += 1
+    def on_created(self, room): self.stats.events += 1; self.created.set(room)
+    def on_assign(self, symbol): self.stats.events += 1; self.symbol = symbol
+
+    def on_state(self, state):
+        self.stats.events += 1
+        if "cells" in state: state = unpack_state(state)
+        self.game = BitboardUltimateTicTacToe.from_state(state)
+        self.sent_at = None
+        self.maybe_move()
+
+    def on_delta(self, delta):
+        self.stats.events += 1
+        if delta["symbol"] == self.symbol and self.sent_at is not None:
+            self.stats.latencies.append(time.perf_counter() - self.sent_at); self.stats.moves += 1
+            self.sent_at = None
+        if not self.game.make_move(delta["board"], delta["cell"]):
+            self.stats.errors += 1; self.sio.emit("sync", {"room": self.room}); return
+        if self.game.game_winner and self.sio.connected:
+            if self.symbol == "X": self.stats.games += 1
+            self.sio.emit("rematch", {"room": self.room})
+        self.maybe_move()
+
+    def maybe_move(self):
+        game = self.game
+        if not game.started or game.game_winner or game.current_player != self.symbol or not self.sio.connected: return
+        board, cell = self.rng.choice(game.legal_moves())
+        if self.think: gevent.sleep(self.think)
+        self.sent_at = time.perf_counter()
+        self.sio.emit("move", {"room": self.room, "board": board, "cell": cell})
+
+    def join(self, room):
+        self.room = room
+        self.sio.emit("join", {"room": room})
+        self.sio.emit("ready", {"room": room})
+
+def open_room(url, stats, rng, think, serializer):
+    host, guest = Player(url, stats, rng, think, serializer), Player(url, stats, rng, think, serializer)
+    host.connect(); guest.connect()
+    host.sio.emit("create")
+    room = host.created.get(timeout=30)
+    host.join(room); guest.join(room)
+    return host, guest
+
+def server_rss_kb(pid):
+    if pid is None: return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return None
+
+def start_server(port, db_path, serializer):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", SOCKETIO_SERIALIZER="msgpack" if serializer == "msgpack" else "json")
+    code = f"import app; app.socketio.run(app.app, host='127.0.0.1', port={port}, log_output=False)"
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc
+        except OSError:
+            if proc.poll() is not None: break
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+def run(url, pid, steps, duration, think, connect_concurrency, seed, serializer="default"):
+    rng = random.Random(seed)
+    stats = Stats()
+    rooms, results = [], []
+    pool = gevent.pool.Pool(connect_concurrency)
+    for target in steps:
+        ramp_start = time.perf_counter()
+        new_rooms = pool.imap_unordered(lambda _: open_room(url, stats, random.Random(rng.random()), think, serializer), range(target - len(rooms)))
+        rooms.extend(new_rooms)
+        ramp_seconds = time.perf_counter() - ramp_start
+        stats.reset()
+        gevent.sleep(duration)
+        elapsed = time.perf_counter() - stats.started
+        latencies = stats.latencies
+        result = {
+            "rooms": len(rooms), "clients": 2 * len(rooms), "seconds": round(elapsed, 2), "ramp_seconds": round(ramp_seconds, 2),
+            "moves": stats.moves, "games": stats.games, "errors": stats.errors,
+            "events_per_second": round(stats.events / elapsed, 1), "moves_per_second": round(stats.moves / elapsed, 1),
+            "rss_kb": server_rss_kb(pid),
+        }
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = percentile(latencies, q)
+            result[f"latency_{name}_ms"] = round(value * 1000, 2) if value is not None else None
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    for host, guest in rooms:
+        host.sio.disconnect(); guest.sio.disconnect()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, nargs="+", default=[50, 200, 500, 1000], help="room counts to ramp through (two clients each)")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds to measure at each step")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds a client waits before each move")
+    parser.add_argument("--connect-concurrency", type=int, default=50)
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid to read RSS from when --url is given")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serializer", choices=["default", "msgpack"], default="default", help="must match the server's SOCKETIO_SERIALIZER")
+    parser.add_argument("--out", help="also write the full run as JSON to this path")
+    args = parser.parse_args(argv)
+
+    proc = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url, pid = args.url.rstrip("/"), args.server_pid
+        else:
+            proc = start_server(args.port, os.path.join(tmp, "loadtest.sqlite3"), args.serializer)
+            url, pid = f"http://127.0.0.1:{args.port}", proc.pid
+        try:
+            results = run(url, pid, sorted(args.rooms), args.duration, args.think, args.connect_concurrency, args.seed, args.serializer)
+        finally:
+            if proc: proc.terminate(); proc.wait(10)
+    if args.out:
+        config = {k: v for k, v in vars(args).items() if k != "out"}
+        config["game_engine"] = os.environ.get("GAME_ENGINE", "list")
+        with open(args.out, "w") as f: json.dump({"config": config, "steps": results}, f, indent=2)
+    return 0 if all(r["errors"] == 0 for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Connection churn against the sid/user indexes in app.py.
+
+Fills the server with idle rooms, then connects, joins and disconnects
+thousands of simulated Socket.IO clients and times the disconnect path. With
+the sid index the per-disconnect cost stays flat as the room count grows.
+
+    python bench/sid_index_stress.py --rooms 100 1000 10000 --churn 2000
+"""
+import argparse, json, os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(app_module, rooms, churn):
+    store = app_module.store
+    for room in store.rooms("guest"): store.delete("guest", room)
+    app_module.sid_index.clear()
+    codes = []
+    for i in range(rooms):
+        code = f"s{i}"
+        # Both seats taken so every churned client lands as a spectator
+        store.save("guest", code, app_module.new_game_data(player_accounts={"X": f"x{i}", "O": f"o{i}"}))
+        codes.append(code)
+    http = app_module.app.test_client(); http.get('/guest')
+    disconnect_time = 0.0
+    start = time.perf_counter()
+    for i in range(churn):
+        client = app_module.socketio.test_client(app_module.app, flask_test_client=http)
+        client.emit('join', {'room': codes[i % rooms]})
+        t = time.perf_counter(); client.disconnect(); disconnect_time += time.perf_counter() - t
+    elapsed = time.perf_counter() - start
+    leaked = len(app_module.sid_index) + sum(len(store.get("guest", code)["spectators"]) for code in codes)
+    return {"rooms": rooms, "connections": churn, "seconds": round(elapsed, 3),
+            "disconnect_us": round(disconnect_time / churn * 1e6, 1), "leaked_entries": leaked}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--churn", type=int, default=2000, help="connections to open and close per room count")
+    args = parser.parse_args(argv)
+
+    import app as app_module
+    results = [run(app_module, rooms, args.churn) for rooms in args.rooms]
+    for result in results: print(json.dumps(result))
+    # Disconnect cost must not scale with the number of rooms
+    flat = results[-1]["disconnect_us"] < 3 * results[0]["disconnect_us"]
+    consistent = all(r["leaked_entries"] == 0 for r in results)
+    return 0 if flat and consistent else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""JSON vs MessagePack Socket.IO packets for game traffic.
+
+Encodes the payloads a game actually sends (a full `state` after every move,
+the `delta` for every move, a `gameStatus`) the way python-socketio does for
+each serializer: the JSON path with boards as nested string lists, the msgpack
+path with boards packed by game.wire. Reports encode CPU time and bytes per
+packet as JSON.
+
+    python bench/wire_bench.py --games 500 --out wire.json
+"""
+import argparse, json, os, random, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from socketio import packet, msgpack_packet
+from game.bitboard import BitboardUltimateTicTacToe
+from game.wire import pack_state
+
+def corpus(games, seed):
+    """(state, delta) pairs for every move of `games` random games."""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(games):
+        game = BitboardUltimateTicTacToe(); game.started = True
+        seq = 0
+        while not game.game_winner:
+            symbol = game.current_player
+            board, cell = rng.choice(game.legal_moves())
+            game.make_move(board, cell); seq += 1
+            delta = {'seq': seq, 'board': board, 'cell': cell, 'symbol': symbol,
+                     'forced': game.forced_board, 'player': game.current_player, 'gameWinner': game.game_winner}
+            events.append((dict(game.state(), seq=seq), delta))
+    return events
+
+def encoded_size(encoded):
+    # The JSON packet class returns a list (packet + attachments) when the payload holds bytes
+    if isinstance(encoded, list): return sum(len(part) for part in encoded)
+    return len(encoded.encode() if isinstance(encoded, str) else encoded)
+
+def measure(packet_class, name, payloads):
+    start = time.perf_counter()
+    encoded = [packet_class(packet.EVENT, data=[name, payload]).encode() for payload in payloads]
+    elapsed = time.perf_counter() - start
+    sizes = [encoded_size(e) for e in encoded]
+    return {"packets": len(payloads), "encode_us": round(elapsed / len(payloads) * 1e6, 2),
+            "bytes_mean": round(sum(sizes) / len(sizes), 1), "bytes_max": max(sizes)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    events = corpus(args.games, args.seed)
+    states = [state for state, _ in events]
+    deltas = [delta for _, delta in events]
+    status = {'players': {'X': 'alice', 'O': 'bob'}, 'text': 'Turn: X', 'button_action': 'resign'}
+    report = {"games": args.games, "moves": len(events), "json": {}, "msgpack": {}}
+    report["json"]["state"] = measure(packet.Packet, "state", states)
+    report["json"]["delta"] = measure(packet.Packet, "delta", deltas)
+    report["json"]["gameStatus"] = measure(packet.Packet, "gameStatus", [status] * len(events))
+    # The server packs boards inside snapshot(), so that cost is counted with the msgpack encode
+    start = time.perf_counter()
+    packed = [dict(pack_state(state), seq=state["seq"]) for state in states]
+    pack_us = (time.perf_counter() - start) / len(states) * 1e6
+    report["msgpack"]["state"] = measure(msgpack_packet.MsgPackPacket, "state", packed)
+    report["msgpack"]["state"]["encode_us"] = round(report["msgpack"]["state"]["encode_us"] + pack_us, 2)
+    report["msgpack"]["delta"] = measure(msgpack_packet.MsgPackPacket, "delta", deltas)
+    report["msgpack"]["gameStatus"] = measure(msgpack_packet.MsgPackPacket, "gameStatus", [status] * len(events))
+    print(json.dumps(report))
+    if args.out:
+        with open(args.out, "w") as f: json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
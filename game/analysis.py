@@ -0,0 +1,129 @@
+"""Post-game analysis.
+
+evaluate() scores a position for the side to move with a depth-limited
+alpha-beta search over game.logic.UltimateTicTacToe, using a static evaluation
+of won mini-boards and open two-in-a-rows at the horizon. judge() compares the
+scores either side of a move to tell how much the move gave away.
+
+EvalCache keeps results under the book's symmetric position_key, so a position
+(in any of its 8 orientations) is searched once however many games reach it.
+The cached score is only valid for one search depth; keep one cache per depth.
+"""
+from collections import OrderedDict
+from game.logic import UltimateTicTacToe, WIN_LINES
+from game.book import SYMMETRIES, INVERSE, WIN_SCORE
+
+# Kept free of gevent/Flask imports: evaluate() runs in spawned pool workers.
+SQUARE_WEIGHTS = [3, 2, 3, 2, 4, 2, 3, 2, 3]  # corners, edges, centre: symmetric, so scores are too
+WON_BOARD = 10
+MACRO_THREAT = 30
+
+def _other(symbol): return "O" if symbol == "X" else "X"
+
+def terminal_score(game):
+    """Score of a finished game for the side to move."""
+    if game.game_winner == "D": return 0
+    return WIN_SCORE if game.game_winner == game.current_player else -WIN_SCORE
+
+def _threats(squares, me, them):
+    # Lines holding two of `me` and an empty third square
+    return sum(1 for line in WIN_LINES
+               if [squares[i] for i in line].count(me) == 2 and not any(squares[i] == them or squares[i] == "D" for i in line))
+
+def _side_score(game, me, them):
+    winners = game.board_winners
+    score = MACRO_THREAT * _threats(winners, me, them)
+    for b in range(9):
+        if winners[b] == me: score += WON_BOARD + 2 * SQUARE_WEIGHTS[b]
+        elif winners[b] is None:
+            score += SQUARE_WEIGHTS[b] * _threats(game.boards[b], me, them)
+            if game.boards[b][4] == me: score += 1
+    return score
+
+def static_score(game):
+    """Heuristic score for the side to move, well inside +-WIN_SCORE."""
+    me = game.current_player
+    return _side_score(game, me, _other(me)) - _side_score(game, _other(me), me)
+
+def legal_moves(game):
+    boards = [game.forced_board] if game.forced_board is not None else [b for b in range(9) if game.board_winners[b] is None]
+    return [(b, c) for b in boards for c in range(9) if game.boards[b][c] is None]
+
+def _children(game):
+    # Moves that take a mini-board first, then by square, so alpha-beta cuts early
+    children = []
+    for b, c in legal_moves(game):
+        child = UltimateTicTacToe.from_state(game.state())
+        child.make_move(b, c)
+        children.append(((child.board_winners[b] == game.current_player, SQUARE_WEIGHTS[c]), (b, c), child))
+    children.sort(key=lambda entry: entry[0], reverse=True)
+    return [(move, child) for _, move, child in children]
+
+def _negamax(game, depth, alpha, beta, nodes):
+    nodes[0] += 1
+    if game.game_winner: return terminal_score(game)
+    if depth == 0: return static_score(game)
+    best = -WIN_SCORE - 1
+    for _, child in _children(game):
+        best = max(best, -_negamax(child, depth - 1, -beta, -alpha, nodes))
+        alpha = max(alpha, best)
+        if alpha >= beta: break
+    return best
+
+def evaluate(state, depth=3):
+    """Score `state` (an engine state() dict) for the side to move.
+
+    Returns {"score", "board", "cell", "nodes"}; board and cell are the best
+    move found, None for a finished game.
+    """
+    game = UltimateTicTacToe.from_state(state)
+    game.started = True
+    if game.game_winner:
+        return {"score": terminal_score(game), "board": None, "cell": None, "nodes": 1}
+    nodes = [1]
+    best, best_move = -WIN_SCORE - 1, None
+    for move, child in _children(game):
+        score = -_negamax(child, depth - 1, -WIN_SCORE - 1, -best, nodes)
+        if score > best: best, best_move = score, move
+    return {"score": best, "board": best_move[0], "cell": best_move[1], "nodes": nodes[0]}
+
+def judge(before, after, threshold):
+    """Verdict on a move from the evaluations of the positions around it.
+
+    `before` is scored for the player who moved and `after` for their
+    opponent, so the move cost before + after points. That is floored at zero:
+    the search after the move sees one ply deeper and can find more.
+    """
+    loss = max(0, before["score"] + after["score"])
+    verdict = {"loss": loss, "blunder": loss >= threshold, "best": None}
+    if verdict["blunder"] and before["board"] is not None:
+        verdict["best"] = {"board": before["board"], "cell": before["cell"]}
+    return verdict
+
+class EvalCache:
+    """Bounded LRU of position_key -> (score, best move in canonical orientation)."""
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def __len__(self): return len(self.entries)
+
+    def get(self, key, symmetry):
+        """Cached evaluation with the best move mapped back onto the position as given, or None."""
+        entry = self.entries.get(key)
+        if entry is None: return None
+        self.entries.move_to_end(key)
+        score, move = entry
+        result = {"score": score, "board": None, "cell": None}
+        if move is not None:
+            b, c = divmod(move, 9)
+            result["board"], result["cell"] = INVERSE[symmetry][b], INVERSE[symmetry][c]
+        return result
+
+    def put(self, key, symmetry, result):
+        move = None
+        if result["board"] is not None:
+            move = SYMMETRIES[symmetry][result["board"]] * 9 + SYMMETRIES[symmetry][result["cell"]]
+        self.entries[key] = (result["score"], move)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
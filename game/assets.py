@@ -0,0 +1,81 @@
+"""Fingerprinted, precompressed static assets.
+
+build() copies every file under the static folder into a build folder under a
+name carrying a hash of its content (js/game.js -> js/game.1a2b3c4d5e6f.js),
+writes .gz and, when the brotli package is installed, .br variants of text
+assets, and finally a manifest.json mapping original names to built ones. A
+changed file gets a new name, so built files can be cached forever; files from
+earlier builds are left in place for pages that still reference them.
+
+    python -m game.assets build static static/dist
+"""
+import argparse, gzip, hashlib, json, os, sys
+try:
+    import brotli
+except ImportError:  # optional: gzip alone is still served
+    brotli = None
+
+MANIFEST = "manifest.json"
+VERSION = 1
+COMPRESSIBLE = {".css", ".js", ".json", ".svg", ".txt", ".html", ".map"}
+
+def fingerprint(name, data):
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.blake2b(data, digest_size=6).hexdigest()}{ext}"
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f: f.write(data)
+    os.replace(tmp, path)
+
+def build(static_dir, out_dir, log=print):
+    """Build every asset under `static_dir` into `out_dir`; returns the manifest."""
+    static_dir, out_dir = os.path.abspath(static_dir), os.path.abspath(out_dir)
+    assets = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != out_dir)
+        for file in sorted(files):
+            name = os.path.relpath(os.path.join(root, file), static_dir).replace(os.sep, "/")
+            with open(os.path.join(root, file), "rb") as f: data = f.read()
+            built = fingerprint(name, data)
+            target = os.path.join(out_dir, built)
+            encodings = []
+            if not os.path.exists(target): _write(target, data)
+            if os.path.splitext(name)[1] in COMPRESSIBLE:
+                variants = [("gzip", ".gz", lambda d: gzip.compress(d, 9, mtime=0))]
+                if brotli: variants.insert(0, ("br", ".br", lambda d: brotli.compress(d, quality=11)))
+                for encoding, suffix, compress in variants:
+                    if not os.path.exists(target + suffix):
+                        compressed = compress(data)
+                        if len(compressed) >= len(data): continue
+                        _write(target + suffix, compressed)
+                    encodings.append(encoding)
+            assets[name] = {"path": built, "encodings": encodings}
+            log(f"{name} -> {built} {' '.join(encodings)}".rstrip())
+    manifest = {"version": VERSION, "assets": assets}
+    _write(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+def load_manifest(out_dir):
+    """original name -> {"path", "encodings"}; empty when nothing has been built."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f: manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if manifest.get("version") != VERSION:
+        raise ValueError(f"{out_dir}/{MANIFEST} is not a version {VERSION} asset manifest")
+    return manifest["assets"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m game.assets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="fingerprint and precompress static assets")
+    b.add_argument("static_dir")
+    b.add_argument("out_dir")
+    args = parser.parse_args(argv)
+    manifest = build(args.static_dir, args.out_dir)
+    print(f"built {len(manifest['assets'])} assets into {args.out_dir}")
+
+if __name__ == "__main__":
+    sys.exit(main())
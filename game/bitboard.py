@@ -0,0 +1,110 @@
+from game.logic import WIN_LINES
+
+# Each mini-board is a 9-bit mask per player (bit c set = cell c taken), and the
+# macro board is the same layout with bit b set = mini-board b won. Everything
+# the rules need about a 9-bit mask is precomputed once into 512-entry tables.
+FULL = 0x1FF
+LINE_MASKS = [(1 << a) | (1 << b) | (1 << c) for a, b, c in WIN_LINES]
+WIN_TABLE = [any(m & line == line for line in LINE_MASKS) for m in range(512)]
+POPCOUNT = [bin(m).count("1") for m in range(512)]
+EMPTY_CELLS = [tuple(c for c in range(9) if not m >> c & 1) for m in range(512)]
+
+class BitboardUltimateTicTacToe:
+    def __init__(self):
+        self.masks = {"X": [0]*9, "O": [0]*9}
+        self.macro = {"X": 0, "O": 0}
+        self.closed = 0  # won or drawn mini-boards
+        self.current_player = "X"
+        self.forced_board = None
+        self.game_winner = None
+        self.started = False
+
+    @property
+    def boards(self):
+        xs, os_ = self.masks["X"], self.masks["O"]
+        return [["X" if xs[b] >> c & 1 else "O" if os_[b] >> c & 1 else None for c in range(9)] for b in range(9)]
+
+    @property
+    def board_winners(self):
+        mx, mo = self.macro["X"], self.macro["O"]
+        return ["X" if mx >> b & 1 else "O" if mo >> b & 1 else "D" if self.closed >> b & 1 else None for b in range(9)]
+
+    @classmethod
+    def from_state(cls, state):
+        game = cls()
+        for b, board in enumerate(state["boards"]):
+            for c, symbol in enumerate(board):
+                if symbol: game.masks[symbol][b] |= 1 << c
+        for b, winner in enumerate(state["winners"]):
+            if winner: game.closed |= 1 << b
+            if winner in ("X", "O"): game.macro[winner] |= 1 << b
+        game.current_player = state["player"]
+        game.forced_board = state["forced"]
+        game.game_winner = state["gameWinner"]
+        game.started = state["started"]
+        return game
+
+    def clone(self):
+        other = BitboardUltimateTicTacToe.__new__(BitboardUltimateTicTacToe)
+        other.masks = {"X": self.masks["X"][:], "O": self.masks["O"][:]}
+        other.macro = dict(self.macro)
+        other.closed = self.closed
+        other.current_player = self.current_player
+        other.forced_board = self.forced_board
+        other.game_winner = self.game_winner
+        other.started = self.started
+        return other
+
+    def legal_moves(self):
+        if not self.started or self.game_winner:
+            return []
+        xs, os_ = self.masks["X"], self.masks["O"]
+        boards = (self.forced_board,) if self.forced_board is not None else EMPTY_CELLS[self.closed]
+        return [(b, c) for b in boards for c in EMPTY_CELLS[xs[b] | os_[b]]]
+
+    def make_move(self, b, c):
+        if not self.started or self.game_winner:
+            return False
+        if not (0 <= b < 9 and 0 <= c < 9):
+            return False
+        if self.closed >> b & 1:
+            return False
+        if self.forced_board is not None and b != self.forced_board:
+            return False
+        player = self.current_player
+        mine = self.masks[player]
+        other = self.masks["O" if player == "X" else "X"]
+        bit = 1 << c
+        if (mine[b] | other[b]) & bit:
+            return False
+
+        mine[b] |= bit
+        if WIN_TABLE[mine[b]]:
+            self.macro[player] |= 1 << b
+            self.closed |= 1 << b
+            if WIN_TABLE[self.macro[player]]:
+                self.game_winner = player
+        elif mine[b] | other[b] == FULL:
+            self.closed |= 1 << b
+
+        # Full macro board: most mini-boards won takes it, otherwise a draw
+        if not self.game_winner and self.closed == FULL:
+            x_wins, o_wins = POPCOUNT[self.macro["X"]], POPCOUNT[self.macro["O"]]
+            self.game_winner = "X" if x_wins > o_wins else "O" if o_wins > x_wins else "D"
+
+        self.forced_board = None if self.closed >> c & 1 else c
+        self.current_player = "O" if player == "X" else "X"
+        return True
+
+    def resign(self, loser):
+        self.game_winner = "O" if loser == "X" else "X"
+
+    def state(self):
+        return {
+            "boards": self.boards,
+            "winners": self.board_winners,
+            "player": self.current_player,
+            "forced": self.forced_board,
+            "gameWinner": self.game_winner,
+            "started": self.started
+        }
@@ -0,0 +1,203 @@
+"""Opening book and endgame tablebase.
+
+Positions are keyed by a 64-bit hash of their canonical form (the smallest
+encoding over the 8 symmetries of the 3x3 grid, applied to the macro board and
+every mini-board at once). The generator writes a sorted array of fixed-size
+records; PositionBook memory-maps it and binary-searches, so opening the file
+is free and every worker process shares the same page cache.
+
+    python -m game.book build book.bin --plies 3 --playouts 2000 --endgames 200
+"""
+import argparse, hashlib, mmap, os, random, struct, sys
+from game import mcts
+from game.bitboard import BitboardUltimateTicTacToe, EMPTY_CELLS
+
+MAGIC = b"UTTTBOOK"
+VERSION = 1
+HEADER = struct.Struct("<8sIQ")  # magic, version, record count
+RECORD = struct.Struct("<QhBB")  # key, score, move (board*9+cell, 255 = none), flags
+NO_MOVE = 255
+BOOK, SOLVED = 1, 2
+WIN_SCORE = 1000  # scores are from the side to move's view, -WIN_SCORE..WIN_SCORE
+
+def _rotate(r, c): return c, 2 - r
+def _flip(r, c): return r, 2 - c
+
+def _symmetries():
+    syms = []
+    for flip in (False, True):
+        for turns in range(4):
+            perm = []
+            for i in range(9):
+                r, c = divmod(i, 3)
+                if flip: r, c = _flip(r, c)
+                for _ in range(turns): r, c = _rotate(r, c)
+                perm.append(r * 3 + c)
+            syms.append(perm)
+    return syms
+
+SYMMETRIES = _symmetries()
+INVERSE = [[perm.index(i) for i in range(9)] for perm in SYMMETRIES]
+PERMUTED_MASKS = [[sum(1 << perm[i] for i in range(9) if m >> i & 1) for m in range(512)] for perm in SYMMETRIES]
+
+def _as_bitboard(game):
+    return game if isinstance(game, BitboardUltimateTicTacToe) else BitboardUltimateTicTacToe.from_state(game.state())
+
+def canonical(game):
+    """Return (canonical encoding, index of the symmetry that produced it)."""
+    game = _as_bitboard(game)
+    xs, os_ = game.masks["X"], game.masks["O"]
+    tail = game.current_player == "O"
+    best = None
+    for s, perm in enumerate(SYMMETRIES):
+        table = PERMUTED_MASKS[s]
+        boards = [0] * 9
+        for b in range(9):
+            boards[perm[b]] = table[xs[b]] << 9 | table[os_[b]]
+        key = 0
+        for value in boards: key = key << 18 | value
+        forced = 0 if game.forced_board is None else perm[game.forced_board] + 1
+        key = (key << 4 | forced) << 1 | tail
+        if best is None or key < best[0]:
+            best = (key, s)
+    return best
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.to_bytes(21, "little"), digest_size=8).digest(), "little")
+
+def position_key(game):
+    """64-bit hash of the position, identical for all 8 symmetric variants."""
+    return _hash(canonical(game)[0])
+
+def canonical_key(game):
+    """(position_key, symmetry index) from a single canonicalisation."""
+    key, s = canonical(game)
+    return _hash(key), s
+
+class PositionBook:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} position book")
+
+    def close(self):
+        self._map.close(); self._file.close()
+
+    def _find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = RECORD.unpack_from(self._map, HEADER.size + mid * RECORD.size)[0]
+            if mid_key < key: lo = mid + 1
+            elif mid_key > key: hi = mid
+            else: return RECORD.unpack_from(self._map, HEADER.size + mid * RECORD.size)
+        return None
+
+    def lookup(self, game):
+        """Return {'score', 'solved', 'board', 'cell'} for `game`, or None if unknown.
+
+        The stored move is in canonical orientation; it is mapped back onto the
+        position as given.
+        """
+        game = _as_bitboard(game)
+        key, s = canonical_key(game)
+        record = self._find(key)
+        if record is None: return None
+        _, score, move, flags = record
+        entry = {"score": score, "solved": bool(flags & SOLVED), "board": None, "cell": None}
+        if move != NO_MOVE:
+            b, c = divmod(move, 9)
+            entry["board"], entry["cell"] = INVERSE[s][b], INVERSE[s][c]
+        return entry
+
+# --- Generation ---
+def _canonical_move(game, board, cell):
+    _, s = canonical(game)
+    return SYMMETRIES[s][board] * 9 + SYMMETRIES[s][cell]
+
+def _terminal_score(game):
+    if game.game_winner == "D": return 0
+    return WIN_SCORE if game.game_winner == game.current_player else -WIN_SCORE
+
+def solve(game, table):
+    """Exact negamax value of `game` for the side to move; fills `table` with
+    key -> (score, canonical move) for every position it proves."""
+    key = position_key(game)
+    if key in table: return table[key][0]
+    if game.game_winner:
+        table[key] = (_terminal_score(game), NO_MOVE)
+        return table[key][0]
+    best, best_move = -WIN_SCORE - 1, NO_MOVE
+    for b, c in game.legal_moves():
+        child = game.clone(); child.make_move(b, c)
+        score = -solve(child, table)
+        if score > best:
+            best, best_move = score, _canonical_move(game, b, c)
+        if best == WIN_SCORE: break
+    table[key] = (best, best_move)
+    return best
+
+def empty_cells(game):
+    xs, os_ = game.masks["X"], game.masks["O"]
+    return sum(len(EMPTY_CELLS[xs[b] | os_[b]]) for b in range(9) if not game.closed >> b & 1)
+
+def build_openings(plies, playouts, seed, log=print):
+    root = BitboardUltimateTicTacToe(); root.started = True
+    records, frontier = {}, [root]
+    for ply in range(plies):
+        next_frontier, seen = [], set()
+        for game in frontier:
+            key = position_key(game)
+            if key not in records:
+                result = mcts.search(game.state(), playouts=playouts, seed=seed)
+                records[key] = (round((2 * result["value"] - 1) * WIN_SCORE), _canonical_move(game, result["board"], result["cell"]), BOOK)
+            for b, c in game.legal_moves():
+                child = game.clone(); child.make_move(b, c)
+                child_key = position_key(child)
+                if not child.game_winner and child_key not in seen:
+                    seen.add(child_key); next_frontier.append(child)
+        log(f"ply {ply}: {len(frontier)} positions")
+        frontier = next_frontier
+    return records
+
+def build_endgames(count, max_empty, seed, log=print):
+    rng = random.Random(seed)
+    table = {}
+    for _ in range(count):
+        game = BitboardUltimateTicTacToe(); game.started = True
+        while not game.game_winner and empty_cells(game) > max_empty:
+            game.make_move(*rng.choice(game.legal_moves()))
+        if not game.game_winner: solve(game, table)
+    log(f"endgames: {count} roots, {len(table)} solved positions")
+    return {key: (score, move, SOLVED) for key, (score, move) in table.items()}
+
+def write_book(path, records):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        for key in sorted(records):
+            score, move, flags = records[key]
+            f.write(RECORD.pack(key, score, move, flags))
+    os.replace(tmp, path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m game.book")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="generate a book file")
+    build.add_argument("path")
+    build.add_argument("--plies", type=int, default=3, help="opening depth to evaluate")
+    build.add_argument("--playouts", type=int, default=2000, help="MCTS playouts per opening position")
+    build.add_argument("--endgames", type=int, default=200, help="random endgame roots to solve")
+    build.add_argument("--max-empty", type=int, default=12, help="empty playable cells at which an endgame is solved")
+    build.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    records = build_openings(args.plies, args.playouts, args.seed)
+    records.update(build_endgames(args.endgames, args.max_empty, args.seed))
+    write_book(args.path, records)
+    print(f"wrote {len(records)} positions to {args.path}")
+
+if __name__ == "__main__":
+    sys.exit(main())
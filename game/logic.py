@@ -13,6 +13,17 @@ class UltimateTicTacToe:
         self.game_winner = None
         self.started = False
 
+    @classmethod
+    def from_state(cls, state):
+        game = cls()
+        game.boards = [list(board) for board in state["boards"]]
+        game.board_winners = list(state["winners"])
+        game.current_player = state["player"]
+        game.forced_board = state["forced"]
+        game.game_winner = state["gameWinner"]
+        game.started = state["started"]
+        return game
+
     def check_win(self, board):
         for a,b,c in WIN_LINES:
             if board[a] and board[a] == board[b] == board[c]:
@@ -0,0 +1,70 @@
+"""Quick-match queue.
+
+Waiting players are kept sorted by rating, so the closest opponent for a new
+arrival is one of its two neighbours: finding it is a binary search. A player
+accepts any opponent within a rating window that widens the longer they wait;
+sweep() re-pairs neighbours whose windows have grown to meet.
+
+Inserting into and deleting from the sorted list moves the entries after it,
+so add() and remove() are O(n) memmoves behind an O(log n) search, like
+game.rating.Leaderboard. The queue only ever holds the players waiting right
+now, which keeps that a small copy; a heap would not give the neighbour
+lookup, and a balanced tree would be a new dependency for no measurable gain.
+"""
+import bisect
+
+class MatchQueue:
+    def __init__(self, window=100, widen_per_second=25, max_window=800):
+        self.window = window
+        self.widen_per_second = widen_per_second
+        self.max_window = max_window
+        self.entries = []  # (rating, user_id), sorted
+        self.players = {}  # user_id -> {"user_id", "rating", "since", ...caller data}
+
+    def __len__(self): return len(self.entries)
+    def __contains__(self, user_id): return user_id in self.players
+
+    def allowed_gap(self, player, now):
+        return min(self.window + self.widen_per_second * (now - player["since"]), self.max_window)
+
+    def _acceptable(self, a, b, now):
+        gap = abs(a["rating"] - b["rating"])
+        return gap <= self.allowed_gap(a, now) and gap <= self.allowed_gap(b, now)
+
+    def add(self, player, now):
+        """Queue `player` (a dict with user_id and rating) or pair it at once.
+
+        Returns the waiting opponent it was paired with (now dequeued), or None.
+        """
+        player = dict(player, since=player.get("since", now))
+        key = (player["rating"], player["user_id"])
+        i = bisect.bisect_left(self.entries, key)
+        candidates = [self.players[self.entries[j][1]] for j in (i - 1, i) if 0 <= j < len(self.entries)]
+        candidates = [other for other in candidates if self._acceptable(player, other, now)]
+        if candidates:
+            opponent = min(candidates, key=lambda other: abs(other["rating"] - player["rating"]))
+            self.remove(opponent["user_id"])
+            return opponent
+        bisect.insort(self.entries, key)
+        self.players[player["user_id"]] = player
+        return None
+
+    def remove(self, user_id):
+        player = self.players.pop(user_id, None)
+        if player is None: return None
+        del self.entries[bisect.bisect_left(self.entries, (player["rating"], user_id))]
+        return player
+
+    def sweep(self, now):
+        """Pair adjacent waiting players whose windows now overlap; returns the pairs."""
+        pairs, kept, i = [], [], 0
+        while i < len(self.entries):
+            if i + 1 < len(self.entries):
+                a, b = self.players[self.entries[i][1]], self.players[self.entries[i + 1][1]]
+                if self._acceptable(a, b, now):
+                    pairs.append((a, b)); i += 2; continue
+            kept.append(self.entries[i]); i += 1
+        for a, b in pairs:
+            del self.players[a["user_id"]], self.players[b["user_id"]]
+        self.entries = kept
+        return pairs
@@ -0,0 +1,73 @@
+import math, random, time
+from game.bitboard import BitboardUltimateTicTacToe
+
+# Kept free of gevent/Flask imports: this module is what the bot process pool
+# imports in its (spawned) workers.
+EXPLORATION = 1.41
+
+class Node:
+    __slots__ = ("move", "parent", "children", "untried", "visits", "wins", "player")
+
+    def __init__(self, game, move=None, parent=None):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = game.legal_moves()
+        self.visits = 0
+        self.wins = 0.0
+        # The player who made `move`, i.e. whose result this node accumulates
+        self.player = "O" if game.current_player == "X" else "X"
+
+    def select_child(self):
+        log_n = math.log(self.visits)
+        return max(self.children, key=lambda n: n.wins / n.visits + EXPLORATION * math.sqrt(log_n / n.visits))
+
+def playout(game, rng):
+    while not game.game_winner:
+        game.make_move(*rng.choice(game.legal_moves()))
+    return game.game_winner
+
+def search(state, think_time=None, playouts=None, seed=None):
+    """Pick a move for the side to play in `state` (an engine state() dict).
+
+    Stops after `think_time` seconds or `playouts` iterations, whichever comes
+    first; at least one of the two must be given.
+    """
+    if think_time is None and playouts is None:
+        raise ValueError("search needs a think_time or playouts budget")
+    start = time.perf_counter()
+    deadline = start + think_time if think_time is not None else None
+    rng = random.Random(seed)
+    root_game = BitboardUltimateTicTacToe.from_state(state)
+    root = Node(root_game)
+    if not root.untried:
+        return None
+
+    iterations = 0
+    while (playouts is None or iterations < playouts) and (deadline is None or time.perf_counter() < deadline):
+        node, game = root, root_game.clone()
+        while not node.untried and node.children:
+            node = node.select_child()
+            game.make_move(*node.move)
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            game.make_move(*move)
+            child = Node(game, move, node)
+            node.children.append(child)
+            node = child
+        winner = playout(game, rng)
+        while node is not None:
+            node.visits += 1
+            if winner == node.player: node.wins += 1
+            elif winner == "D": node.wins += 0.5
+            node = node.parent
+        iterations += 1
+
+    best = max(root.children, key=lambda n: n.visits)
+    return {
+        "board": best.move[0],
+        "cell": best.move[1],
+        "value": best.wins / best.visits,
+        "playouts": iterations,
+        "think_time": time.perf_counter() - start,
+    }
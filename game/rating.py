@@ -0,0 +1,39 @@
+import bisect
+
+INITIAL_RATING = 1200.0
+K_FACTOR = 32
+
+def expected_score(rating, opponent):
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+def elo_update(rating_a, rating_b, score_a, k=K_FACTOR):
+    """New (rating_a, rating_b) after a game where A scored `score_a` (1, 0.5 or 0)."""
+    delta = k * (score_a - expected_score(rating_a, rating_b))
+    return rating_a + delta, rating_b - delta
+
+class Leaderboard:
+    """Ratings kept sorted in memory: O(log n) rank lookups, cheap top-N slices.
+
+    Entries are (-rating, user_id) so the list sorts best-first with user id as
+    a stable tiebreak.
+    """
+    def __init__(self):
+        self.entries = []
+        self.players = {}  # user_id -> (rating, username)
+
+    def __len__(self): return len(self.entries)
+
+    def update(self, user_id, username, rating):
+        if user_id in self.players:
+            old = (-self.players[user_id][0], user_id)
+            del self.entries[bisect.bisect_left(self.entries, old)]
+        bisect.insort(self.entries, (-rating, user_id))
+        self.players[user_id] = (rating, username)
+
+    def rank(self, user_id):
+        if user_id not in self.players: return None
+        return bisect.bisect_left(self.entries, (-self.players[user_id][0], user_id)) + 1
+
+    def top(self, limit, offset=0):
+        return [{"rank": offset + i + 1, "user_id": user_id, "username": self.players[user_id][1], "rating": round(-neg_rating)}
+                for i, (neg_rating, user_id) in enumerate(self.entries[offset:offset + limit])]
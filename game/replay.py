@@ -0,0 +1,53 @@
+"""Match replays from compact move logs.
+
+A finished match stores its moves as bytes, one per move (board * 9 + cell).
+Positions are rebuilt lazily by re-applying moves; SnapshotCache keeps the
+engine state every `interval` plies so seeking into a long game replays at
+most `interval` moves instead of the whole log.
+"""
+from collections import OrderedDict
+
+class SnapshotCache:
+    """Bounded LRU of (match id, ply) -> engine state() dict."""
+    def __init__(self, interval=10, max_entries=2048):
+        self.interval = interval
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, match_id, ply):
+        state = self.entries.get((match_id, ply))
+        if state is not None: self.entries.move_to_end((match_id, ply))
+        return state
+
+    def put(self, match_id, ply, state):
+        # The list engine's state() shares its live lists, so keep a copy
+        self.entries[(match_id, ply)] = dict(state, boards=[list(board) for board in state["boards"]], winners=list(state["winners"]))
+        self.entries.move_to_end((match_id, ply))
+        while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+
+    def nearest(self, match_id, ply):
+        """Latest cached (ply, state) at or before `ply`, or (0, None)."""
+        for snap in range(ply - ply % self.interval, 0, -self.interval):
+            state = self.get(match_id, snap)
+            if state is not None: return snap, state
+        return 0, None
+
+def positions(engine, log, start=0, stop=None, match_id=None, cache=None):
+    """Yield (ply, (board, cell), state) for plies start..stop of `log`.
+
+    Ply 0 is the empty board, with move None. With a cache, replay resumes
+    from the nearest snapshot and records new ones on the way.
+    """
+    stop = len(log) if stop is None else min(stop, len(log))
+    ply, state = cache.nearest(match_id, start) if cache else (0, None)
+    game = engine.from_state(state) if state else engine()
+    game.started = True
+    if ply == start: yield ply, divmod(log[ply - 1], 9) if ply else None, game.state()
+    while ply < stop:
+        board, cell = divmod(log[ply], 9)
+        if not game.make_move(board, cell):
+            raise ValueError(f"illegal move {board},{cell} at ply {ply + 1}")
+        ply += 1
+        if cache and ply % cache.interval == 0 and cache.get(match_id, ply) is None:
+            cache.put(match_id, ply, game.state())
+        if ply >= start: yield ply, (board, cell), game.state()
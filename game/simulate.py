@@ -0,0 +1,142 @@
+"""Batched random self-play on NumPy bitmasks.
+
+Holds N games as arrays (per-player 9-bit masks for every mini-board, plus the
+closed/won macro masks) and advances all of them one ply per step, using the
+same 512-entry tables as the bitboard engine. Offline tooling only: needs numpy,
+which the web app does not.
+
+    python -m game.simulate --games 100000 --seed 1
+    python -m game.simulate --games 2000 --verify
+"""
+import argparse, json, sys, time
+import numpy as np
+from game.bitboard import WIN_TABLE, POPCOUNT
+from game.logic import UltimateTicTacToe
+
+WIN = np.array(WIN_TABLE, dtype=bool)
+POP = np.array(POPCOUNT, dtype=np.int8)
+# EMPTY[m, c] is True when cell c is free in occupancy mask m
+EMPTY = np.array([[not m >> c & 1 for c in range(9)] for m in range(512)], dtype=bool)
+BITS = (1 << np.arange(9)).astype(np.uint16)
+FULL = 0x1FF
+NONE, X_WINS, O_WINS, DRAW = 0, 1, 2, 3
+SYMBOLS = {NONE: None, X_WINS: "X", O_WINS: "O", DRAW: "D"}
+
+class Batch:
+    def __init__(self, n):
+        self.n = n
+        self.marks = np.zeros((n, 2, 9), dtype=np.uint16)  # [game, player (0 = X), board]
+        self.macro = np.zeros((n, 2), dtype=np.uint16)
+        self.closed = np.zeros(n, dtype=np.uint16)
+        self.current = np.zeros(n, dtype=np.int8)
+        self.forced = np.full(n, -1, dtype=np.int8)
+        self.winner = np.zeros(n, dtype=np.int8)
+        self.plies = np.zeros(n, dtype=np.int16)
+
+    def legal_mask(self):
+        """(n, 9, 9) bool: board b / cell c is playable in each game."""
+        open_boards = (self.closed[:, None] & BITS) == 0
+        boards = np.where(self.forced[:, None] >= 0, np.arange(9) == self.forced[:, None], open_boards)
+        boards &= (self.winner == NONE)[:, None]
+        return boards[:, :, None] & EMPTY[self.marks[:, 0] | self.marks[:, 1]]
+
+    def step(self, rng, tiebreak=True):
+        """Play one uniformly random legal move in every unfinished game.
+
+        Returns (active game indices, chosen board, chosen cell).
+        """
+        legal = self.legal_mask().reshape(self.n, 81)
+        active = np.flatnonzero(self.winner == NONE)
+        if not len(active): return active, active, active
+        choice = np.argmax(np.where(legal[active], rng.random((len(active), 81)), -1.0), axis=1)
+        b, c = choice // 9, choice % 9
+        p = self.current[active].astype(np.intp)
+
+        mine = self.marks[active, p, b] | BITS[c]
+        self.marks[active, p, b] = mine
+        won = WIN[mine]
+        full = (mine | self.marks[active, 1 - p, b]) == FULL
+        board_bit = BITS[b]
+        self.closed[active] |= np.where(won | full, board_bit, 0).astype(np.uint16)
+        self.macro[active, p] |= np.where(won, board_bit, 0).astype(np.uint16)
+
+        game_won = WIN[self.macro[active, p]]
+        winner = np.where(game_won, p + 1, NONE)
+        macro_full = ~game_won & (self.closed[active] == FULL)
+        if tiebreak:
+            x_boards, o_boards = POP[self.macro[active, 0]], POP[self.macro[active, 1]]
+            tb = np.where(x_boards > o_boards, X_WINS, np.where(o_boards > x_boards, O_WINS, DRAW))
+        else:
+            tb = DRAW
+        self.winner[active] = np.where(macro_full, tb, winner)
+
+        self.forced[active] = np.where(self.closed[active] & BITS[c], -1, c)
+        self.current[active] ^= 1
+        self.plies[active] += 1
+        return active, b, c
+
+def simulate(n, seed=None, tiebreak=True, record=False):
+    rng = np.random.default_rng(seed)
+    batch = Batch(n)
+    history = []
+    start = time.perf_counter()
+    while (batch.winner == NONE).any():
+        active, b, c = batch.step(rng, tiebreak)
+        if record:
+            history.append((active, b, c, batch.closed[active].copy(), batch.macro[active].copy(), batch.forced[active].copy(), batch.winner[active].copy()))
+    elapsed = time.perf_counter() - start
+    return batch, elapsed, history
+
+def summary(batch, elapsed):
+    n = batch.n
+    return {
+        "games": n,
+        "seconds": round(elapsed, 3),
+        "games_per_second": round(n / elapsed, 1) if elapsed else None,
+        "x_win_rate": float((batch.winner == X_WINS).sum() / n),
+        "o_win_rate": float((batch.winner == O_WINS).sum() / n),
+        "draw_rate": float((batch.winner == DRAW).sum() / n),
+        "mean_plies": float(batch.plies.mean()),
+    }
+
+def _decoded_winners(closed, macro):
+    return ["X" if macro[0] >> b & 1 else "O" if macro[1] >> b & 1 else "D" if closed >> b & 1 else None for b in range(9)]
+
+def verify(n, seed):
+    """Replay every batched move through the scalar engine and compare the
+    mini-board results, forced board and game result after each ply.
+    Returns a list of mismatch descriptions (empty when they agree)."""
+    _, _, history = simulate(n, seed, tiebreak=True, record=True)
+    games = [UltimateTicTacToe() for _ in range(n)]
+    for game in games: game.started = True
+    mismatches = []
+    for ply, (active, b, c, closed, macro, forced, winner) in enumerate(history):
+        for i, g in enumerate(active):
+            game = games[g]
+            if not game.make_move(int(b[i]), int(c[i])):
+                mismatches.append(f"game {g} ply {ply}: scalar engine rejected move ({b[i]}, {c[i]})"); continue
+            expected = (game.board_winners, game.forced_board, game.game_winner)
+            got = (_decoded_winners(int(closed[i]), macro[i]), None if forced[i] < 0 else int(forced[i]), SYMBOLS[int(winner[i])])
+            if expected != got:
+                mismatches.append(f"game {g} ply {ply}: scalar {expected} != batched {got}")
+    return mismatches
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m game.simulate")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-tiebreak", action="store_true", help="score a full macro board without a line as a draw")
+    parser.add_argument("--verify", action="store_true", help="cross-check every move against game.logic")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        mismatches = verify(args.games, args.seed if args.seed is not None else 0)
+        for line in mismatches[:20]: print(line)
+        print(json.dumps({"games": args.games, "mismatches": len(mismatches)}))
+        return 1 if mismatches else 0
+    batch, elapsed, _ = simulate(args.games, args.seed, tiebreak=not args.no_tiebreak)
+    print(json.dumps(summary(batch, elapsed)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
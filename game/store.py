@@ -0,0 +1,282 @@
+"""Live room storage.
+
+A room's data is the dict built by app.new_game_data(). Handlers work on it
+inside ``store.transaction(namespace, room)``, which holds the room's lock,
+yields the room (or None) and writes it back afterwards.
+
+MemoryStore keeps rooms as live objects in this process (a single worker).
+RedisStore keeps them in any Redis-protocol server, so several workers or
+hosts can share rooms; pair it with Flask-SocketIO's message_queue so
+broadcasts reach sockets connected to other workers.
+
+Both keep a time-ordered activity index (touched whenever a transaction
+finds the room) so idle rooms can be found without scanning every room.
+
+MemoryStore can also write its rooms to a snapshot file and restore them
+after a restart: one header line (format version and the user index), then
+one "namespace room json" line per room. Restored rooms stay as raw lines
+until first accessed, so startup only splits lines.
+"""
+import json, os, sys, threading, time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from itertools import islice
+
+NAMESPACES = ("users", "guest")
+SNAPSHOT_VERSION = 1
+
+def deep_sizeof(obj, seen=None):
+    """Rough recursive sys.getsizeof, for per-room memory estimates."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen: return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+class Restored:
+    """A room read from a snapshot and not yet decoded."""
+    __slots__ = ("raw",)
+    def __init__(self, raw): self.raw = raw
+
+class MemoryStore:
+    def __init__(self):
+        self.namespaces = {namespace: {} for namespace in NAMESPACES}
+        self.user_rooms = {}
+        self.activity = OrderedDict()  # (namespace, room) -> last activity, oldest first
+        self._locks = {}
+        self._encoded = {}  # (namespace, room) -> (activity stamp, snapshot json) from the last snapshot
+        self._restore_args = None
+
+    def _room(self, namespace, room):
+        game_data = self.namespaces[namespace].get(room)
+        if type(game_data) is Restored:
+            game_data = self.namespaces[namespace][room] = load_room(game_data.raw, *self._restore_args)
+        return game_data
+
+    def exists(self, namespace, room): return room in self.namespaces[namespace]
+    def get(self, namespace, room): return self._room(namespace, room)
+    def save(self, namespace, room, game_data):
+        self.namespaces[namespace][room] = game_data
+        self.touch(namespace, room)
+    def count(self, namespace): return len(self.namespaces[namespace])
+    def rooms(self, namespace): return list(self.namespaces[namespace])
+    def sample_rooms(self, namespace, count): return list(islice(self.namespaces[namespace], count))
+
+    def room_bytes(self, namespace, room):
+        # None for a room still waiting in its snapshot line: sizing it must not decode it
+        game_data = self.namespaces[namespace].get(room)
+        return None if game_data is None or type(game_data) is Restored else deep_sizeof(game_data)
+
+    def create(self, namespace, room, game_data):
+        """Store a new room; False if the code is already taken."""
+        if room in self.namespaces[namespace]: return False
+        self.save(namespace, room, game_data)
+        return True
+
+    def delete(self, namespace, room):
+        self.namespaces[namespace].pop(room, None)
+        self.activity.pop((namespace, room), None)
+        self._locks.pop((namespace, room), None)
+        self._encoded.pop((namespace, room), None)
+
+    def touch(self, namespace, room):
+        self.activity[(namespace, room)] = time.time()
+        self.activity.move_to_end((namespace, room))
+
+    def idle_rooms(self, namespace, cutoff):
+        """Rooms in `namespace` with no activity since `cutoff`, oldest first."""
+        idle = []
+        for (ns, room), last_active in self.activity.items():
+            if last_active >= cutoff: break
+            if ns == namespace: idle.append(room)
+        return idle
+
+    @contextmanager
+    def transaction(self, namespace, room):
+        # Reentrant so helpers called from a handler may open the same room again
+        lock = self._locks.setdefault((namespace, room), threading.RLock())
+        with lock:
+            game_data = self._room(namespace, room)
+            yield game_data
+            if game_data is not None and room in self.namespaces[namespace]:
+                self.touch(namespace, room)
+
+    def get_user_room(self, user_id): return self.user_rooms.get(user_id)
+    def set_user_room(self, user_id, namespace, room): self.user_rooms[user_id] = (namespace, room)
+    def clear_user_room(self, user_id): self.user_rooms.pop(user_id, None)
+    def count_user_rooms(self): return len(self.user_rooms)
+
+    def write_snapshot(self, path, engines, prepare=lambda game_data: game_data, pause=None, pause_every=500):
+        """Write every room to `path` atomically; returns the number of rooms.
+
+        `prepare` turns a room into what should survive a restart. Rooms not
+        touched since the previous snapshot reuse their encoding from it;
+        `pause` (if given) is called after every `pause_every` rooms encoded
+        afresh, so a caller on an event loop can let other work run.
+        """
+        tmp = f"{path}.tmp"
+        count = encoded = 0
+        with open(tmp, "w") as f:
+            f.write(json.dumps({"version": SNAPSHOT_VERSION, "written": time.time(), "user_rooms": self.user_rooms}) + "\n")
+            for namespace, rooms in self.namespaces.items():
+                for room, game_data in list(rooms.items()):
+                    if type(game_data) is Restored:
+                        raw = game_data.raw
+                    else:
+                        stamp = self.activity.get((namespace, room))
+                        cached = self._encoded.get((namespace, room))
+                        if cached and cached[0] == stamp:
+                            raw = cached[1]
+                        else:
+                            raw = dump_room(prepare(game_data), engines)
+                            self._encoded[(namespace, room)] = (stamp, raw)
+                            encoded += 1
+                            if pause and encoded % pause_every == 0: pause()
+                    f.write(f"{namespace} {room} {raw}\n")
+                    count += 1
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return count
+
+    def restore(self, path, engines, chat_history_limit=None):
+        """Load a snapshot written by write_snapshot; rooms are decoded on first access."""
+        self._restore_args = (engines, chat_history_limit)
+        with open(path) as f:
+            header = json.loads(f.readline())
+            if header.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} room snapshot")
+            now = time.time()
+            count = 0
+            for line in f:
+                namespace, room, raw = line.rstrip("\n").split(" ", 2)
+                self.namespaces[namespace][room] = Restored(raw)
+                self.activity[(namespace, room)] = now
+                count += 1
+        self.user_rooms.update((user_id, tuple(entry)) for user_id, entry in header["user_rooms"].items())
+        return count
+
+# --- Redis ---
+def encode_game(game, engine_name):
+    # 81 cells and 9 mini-board results as strings, '.' for empty
+    state = game.state()
+    return {
+        "engine": engine_name,
+        "cells": "".join(symbol or "." for board in state["boards"] for symbol in board),
+        "winners": "".join(winner or "." for winner in state["winners"]),
+        "player": state["player"], "forced": state["forced"],
+        "winner": state["gameWinner"], "started": state["started"],
+    }
+
+def decode_game(data, engines):
+    cells = [symbol if symbol != "." else None for symbol in data["cells"]]
+    return engines[data["engine"]].from_state({
+        "boards": [cells[b * 9:b * 9 + 9] for b in range(9)],
+        "winners": [winner if winner != "." else None for winner in data["winners"]],
+        "player": data["player"], "forced": data["forced"],
+        "gameWinner": data["winner"], "started": data["started"],
+    })
+
+def dump_room(game_data, engines):
+    engine_name = next(name for name, cls in engines.items() if type(game_data["game"]) is cls)
+    data = dict(game_data)
+    data["game"] = encode_game(game_data["game"], engine_name)
+    data["ready"] = list(game_data["ready"])
+    data["rematchReady"] = list(game_data["rematchReady"])
+    data["chat_history"] = list(game_data["chat_history"])
+    data["moves"] = game_data["moves"].hex()
+    return json.dumps(data, separators=(",", ":"))
+
+def load_room(raw, engines, chat_history_limit=None):
+    data = json.loads(raw)
+    data["game"] = decode_game(data["game"], engines)
+    data["ready"] = set(data["ready"])
+    data["rematchReady"] = set(data["rematchReady"])
+    data["chat_history"] = deque(data["chat_history"], maxlen=chat_history_limit)
+    data["moves"] = bytearray.fromhex(data["moves"])
+    return data
+
+class RedisStore:
+    def __init__(self, url, engines, prefix="uttt", lock_timeout=10, chat_history_limit=None):
+        import redis  # only needed for this backend
+        self.client = redis.Redis.from_url(url) if isinstance(url, str) else url
+        self.engines = engines
+        self.chat_history_limit = chat_history_limit
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+
+    def _room_key(self, namespace, room): return f"{self.prefix}:room:{namespace}:{room}"
+    def _index_key(self, namespace): return f"{self.prefix}:rooms:{namespace}"
+    def _user_key(self, user_id): return f"{self.prefix}:user:{user_id}"
+    def _activity_key(self, namespace): return f"{self.prefix}:activity:{namespace}"
+    def _seated_key(self): return f"{self.prefix}:seated"
+
+    def exists(self, namespace, room): return bool(self.client.exists(self._room_key(namespace, room)))
+    def count(self, namespace): return self.client.scard(self._index_key(namespace))
+    def rooms(self, namespace): return [room.decode() for room in self.client.smembers(self._index_key(namespace))]
+    def sample_rooms(self, namespace, count): return [room.decode() for room in self.client.srandmember(self._index_key(namespace), count)]
+    def room_bytes(self, namespace, room): return self.client.strlen(self._room_key(namespace, room)) or None
+
+    def get(self, namespace, room):
+        raw = self.client.get(self._room_key(namespace, room))
+        return load_room(raw, self.engines, self.chat_history_limit) if raw is not None else None
+
+    def save(self, namespace, room, game_data):
+        pipe = self.client.pipeline()
+        pipe.set(self._room_key(namespace, room), dump_room(game_data, self.engines))
+        pipe.sadd(self._index_key(namespace), room)
+        pipe.zadd(self._activity_key(namespace), {room: time.time()})
+        pipe.execute()
+
+    def create(self, namespace, room, game_data):
+        if not self.client.set(self._room_key(namespace, room), dump_room(game_data, self.engines), nx=True):
+            return False
+        self.client.sadd(self._index_key(namespace), room)
+        self.touch(namespace, room)
+        return True
+
+    def delete(self, namespace, room):
+        pipe = self.client.pipeline()
+        pipe.delete(self._room_key(namespace, room))
+        pipe.srem(self._index_key(namespace), room)
+        pipe.zrem(self._activity_key(namespace), room)
+        pipe.execute()
+
+    def touch(self, namespace, room): self.client.zadd(self._activity_key(namespace), {room: time.time()})
+
+    def idle_rooms(self, namespace, cutoff):
+        return [room.decode() for room in self.client.zrangebyscore(self._activity_key(namespace), 0, cutoff, start=0, num=1000)]
+
+    @contextmanager
+    def transaction(self, namespace, room):
+        # Per-room lock shared by every worker; the room is re-read under the lock
+        # and written back afterwards. Not reentrant: handlers open one room once.
+        with self.client.lock(f"{self.prefix}:lock:{namespace}:{room}", timeout=self.lock_timeout):
+            game_data = self.get(namespace, room)
+            yield game_data
+            if game_data is not None and self.client.exists(self._room_key(namespace, room)):
+                self.save(namespace, room, game_data)
+
+    def get_user_room(self, user_id):
+        value = self.client.get(self._user_key(user_id))
+        return tuple(value.decode().split(":", 1)) if value is not None else None
+
+    # The seated set mirrors the user keys so counting them is one SCARD, not a keyspace scan
+    def set_user_room(self, user_id, namespace, room):
+        pipe = self.client.pipeline()
+        pipe.set(self._user_key(user_id), f"{namespace}:{room}")
+        pipe.sadd(self._seated_key(), user_id)
+        pipe.execute()
+
+    def clear_user_room(self, user_id):
+        pipe = self.client.pipeline()
+        pipe.delete(self._user_key(user_id))
+        pipe.srem(self._seated_key(), user_id)
+        pipe.execute()
+
+    def count_user_rooms(self): return self.client.scard(self._seated_key())
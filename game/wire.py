@@ -0,0 +1,24 @@
+"""Packed engine state for the binary (MessagePack) Socket.IO serializer.
+
+The 81 cells and 9 mini-board results travel as byte strings, one byte per
+square (0 empty, 1 X, 2 O, 3 drawn), instead of nested lists of strings.
+"""
+CODES = {None: 0, "X": 1, "O": 2, "D": 3}
+SYMBOLS = (None, "X", "O", "D")
+
+def pack_state(state):
+    return {
+        "cells": bytes(CODES[symbol] for board in state["boards"] for symbol in board),
+        "winners": bytes(CODES[winner] for winner in state["winners"]),
+        "player": state["player"], "forced": state["forced"],
+        "gameWinner": state["gameWinner"], "started": state["started"],
+    }
+
+def unpack_state(packed):
+    cells = [SYMBOLS[code] for code in packed["cells"]]
+    return {
+        "boards": [cells[b * 9:b * 9 + 9] for b in range(9)],
+        "winners": [SYMBOLS[code] for code in packed["winners"]],
+        "player": packed["player"], "forced": packed["forced"],
+        "gameWinner": packed["gameWinner"], "started": packed["started"],
+    }
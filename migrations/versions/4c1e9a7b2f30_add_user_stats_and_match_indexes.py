@@ -0,0 +1,52 @@
+"""Add user stats table and match indexes
+
+Revision ID: 4c1e9a7b2f30
+Revises: d7903cc99437
+Create Date: 2026-10-17 15:02:11.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e9a7b2f30'
+down_revision = 'd7903cc99437'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False),
+        sa.Column('losses', sa.Integer(), nullable=False),
+        sa.Column('draws', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('match', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_match_player1_id'), ['player1_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_match_player2_id'), ['player2_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_match_winner_id'), ['winner_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_match_timestamp'), ['timestamp'], unique=False)
+
+    # Backfill from existing history; afterwards the app keeps these counts up to date
+    op.execute("""
+        INSERT INTO user_stats (user_id, wins, losses, draws)
+        SELECT u.id,
+            (SELECT COUNT(*) FROM match m WHERE m.winner_id = u.id),
+            (SELECT COUNT(*) FROM match m WHERE (m.player1_id = u.id OR m.player2_id = u.id)
+                AND m.winner_id IS NOT NULL AND m.winner_id <> u.id),
+            (SELECT COUNT(*) FROM match m WHERE (m.player1_id = u.id OR m.player2_id = u.id) AND m.is_draw)
+        FROM "user" u
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('match', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_match_timestamp'))
+        batch_op.drop_index(batch_op.f('ix_match_winner_id'))
+        batch_op.drop_index(batch_op.f('ix_match_player2_id'))
+        batch_op.drop_index(batch_op.f('ix_match_player1_id'))
+    op.drop_table('user_stats')
@@ -0,0 +1,27 @@
+"""Add user rating
+
+Revision ID: 9b3f2d6e81a4
+Revises: 4c1e9a7b2f30
+Create Date: 2026-10-17 15:41:37.902614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3f2d6e81a4'
+down_revision = '4c1e9a7b2f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing players start at the default; run `flask rebuild-ratings` to backfill from history
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating', sa.Float(), server_default='1200.0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user_stats', schema=None) as batch_op:
+        batch_op.drop_column('rating')
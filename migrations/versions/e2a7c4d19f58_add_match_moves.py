@@ -0,0 +1,27 @@
+"""Add match move log
+
+Revision ID: e2a7c4d19f58
+Revises: 9b3f2d6e81a4
+Create Date: 2026-10-17 16:20:11.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7c4d19f58'
+down_revision = '9b3f2d6e81a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One byte per move (board * 9 + cell); matches recorded before this have no log
+    with op.batch_alter_table('match', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('moves', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('match', schema=None) as batch_op:
+        batch_op.drop_column('moves')
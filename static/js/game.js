@@ -7,6 +7,11 @@ let isSpectator = false;
 let gameEnded = false;
 let lastWinners = Array(9).fill(null);
 let gameState = {};
+let seq = -1;
+let lastChatId = 0;
+let syncing = false;
+let miniDivs = [];
+let cellDivs = [];
 
 // --- DOM Elements ---
 const boardDiv = document.getElementById("board");
@@ -27,14 +32,18 @@ const victoryText = document.getElementById("victory-text");
 const victorySubtext = document.getElementById("victory-subtext");
 const playerXDiv = document.getElementById("player-X");
 const playerODiv = document.getElementById("player-O");
+const analysisCard = document.getElementById("analysis-card");
+const analysisSummary = document.getElementById("analysis-summary");
+const analysisList = document.getElementById("analysis-list");
 
 // --- Sound Effects ---
+// URLs come from the page (SOUND_URLS) so they resolve through the asset manifest
 const sounds = {
-    place: new Audio('/static/sounds/place.mp3'),
-    win: new Audio('/static/sounds/win.mp3'),
-    gameWin: new Audio('/static/sounds/game-win.mp3'),
-    gameLose: new Audio('/static/sounds/lose.mp3'),
-    chat: new Audio('/static/sounds/chat.mp3')
+    place: new Audio(SOUND_URLS.place),
+    win: new Audio(SOUND_URLS.win),
+    gameWin: new Audio(SOUND_URLS.gameWin),
+    gameLose: new Audio(SOUND_URLS.gameLose),
+    chat: new Audio(SOUND_URLS.chat)
 };
 function playSound(sound) {
     sounds[sound].volume = 0.5;
@@ -43,14 +52,32 @@ function playSound(sound) {
 }
 
 // --- Socket Listeners ---
-socket.on('connect', () => { socket.emit("join", { room: ROOM }); });
+// On reconnect only the chat messages after the last one seen are sent again
+socket.on('connect', () => { socket.emit("join", { room: ROOM, chat_after: lastChatId }); });
 socket.on("assign", s => { mySymbol = s; playerText.textContent = `You are ${s}`; });
 socket.on("spectator", () => {
     isSpectator = true;
     playerText.textContent = "You are a spectator";
     if(actionBtn) actionBtn.style.display = "none";
 });
-socket.on("state", (newState) => { gameState = newState; draw(newState); });
+// With the msgpack serializer boards arrive packed, one byte per square
+const SYMBOLS = [null, "X", "O", "D"];
+function unpackState(packed) {
+    const cells = Array.from(new Uint8Array(packed.cells), code => SYMBOLS[code]);
+    const boards = [];
+    for (let b = 0; b < 9; b++) boards.push(cells.slice(b * 9, b * 9 + 9));
+    const winners = Array.from(new Uint8Array(packed.winners), code => SYMBOLS[code]);
+    return { ...packed, boards, winners };
+}
+
+socket.on("state", (newState) => {
+    if (newState.cells) newState = unpackState(newState);
+    gameState = newState;
+    seq = newState.seq;
+    syncing = false;
+    draw(newState);
+});
+socket.on("delta", applyDelta);
 
 socket.on("gameStatus", (data) => {
     status.textContent = data.text;
@@ -81,6 +108,7 @@ socket.on("rematchAgreed", () => {
     gameEnded = false;
     lastWinners = Array(9).fill(null);
     victoryModal.style.display = "none";
+    resetAnalysis();
 });
 
 socket.on("spectatorList", data => {
@@ -97,6 +125,8 @@ socket.on("spectatorList", data => {
 });
 
 function renderMessage(data) {
+    if (data.id <= lastChatId) return;
+    lastChatId = data.id;
     myUsername = document.body.dataset.username;
     const isMyMsg = data.username === myUsername;
     const isSpectatorMsg = data.is_spectator;
@@ -134,11 +164,23 @@ function renderMessage(data) {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
-socket.on("chatMessage", renderMessage);
+function renderNotice(text) {
+    const noticeDiv = document.createElement("div");
+    noticeDiv.className = "chat-message chat-notice";
+    noticeDiv.textContent = text;
+    chatMessages.appendChild(noticeDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+socket.on("chatMessages", data => { data.messages.forEach(renderMessage); });
 socket.on("chatHistory", data => {
-    chatMessages.innerHTML = '';
+    if (data.reset) {
+        chatMessages.innerHTML = '';
+        lastChatId = 0;
+    }
     data.history.forEach(renderMessage);
 });
+socket.on("chatError", data => { renderNotice(data.error); });
 
 // --- UI Handlers ---
 function sendChatMessage() {
@@ -167,6 +209,39 @@ homeBtn.onclick = () => {
     window.location.href = "/home";
 };
 
+// --- Post-game Analysis ---
+// Moves are reported as the server finishes searching them, in no particular
+// order; blunders are listed by move number and outlined on the board. Results
+// for an earlier game (before a rematch) carry an older seq and are ignored.
+function resetAnalysis() {
+    analysisCard.style.display = "none";
+    analysisSummary.textContent = "Analysing the game…";
+    analysisList.innerHTML = "";
+}
+
+socket.on("analysis", data => {
+    if (data.seq !== seq) return;
+    analysisCard.style.display = "block";
+    if (!data.blunder) return;
+    const li = document.createElement("li");
+    li.value = data.ply;
+    li.className = `analysis-blunder ${data.symbol}`;
+    li.textContent = `${data.symbol} on board ${data.board + 1}, cell ${data.cell + 1}: blunder (-${data.loss})`;
+    if (data.best) li.textContent += `, better was board ${data.best.board + 1}, cell ${data.best.cell + 1}`;
+    const next = Array.from(analysisList.children).find(item => item.value > data.ply);
+    analysisList.insertBefore(li, next || null);
+    if (cellDivs.length) cellDivs[data.board][data.cell].classList.add("blunder");
+});
+
+socket.on("analysisDone", data => {
+    if (data.seq !== seq) return;
+    analysisCard.style.display = "block";
+    const count = n => `${n} blunder${n === 1 ? "" : "s"}`;
+    analysisSummary.textContent = data.blunders.X + data.blunders.O
+        ? `${data.moves} moves analysed. X: ${count(data.blunders.X)}, O: ${count(data.blunders.O)}.`
+        : `${data.moves} moves analysed. No blunders.`;
+});
+
 // --- Main Draw & UI Update Functions ---
 function updatePlayerInfo(players) {
     myUsername = document.body.dataset.username;
@@ -182,43 +257,99 @@ function updatePlayerInfo(players) {
     renderPlayer(playerODiv, 'O', players.O);
 }
 
-function draw(state) {
+function buildBoard() {
     boardDiv.innerHTML = "";
-    if (state.gameWinner && !gameEnded) {
-        showVictoryAnimation(state.gameWinner);
-    }
-    gameEnded = !!state.gameWinner;
+    miniDivs = [];
+    cellDivs = [];
     for (let b = 0; b < 9; b++) {
         const mini = document.createElement("div");
         mini.className = "mini-board";
-        if (state.winners[b] && state.winners[b] !== "D") {
-            if (lastWinners[b] !== state.winners[b]) playSound('win');
-            mini.classList.add(`won-${state.winners[b]}`);
-            const overlay = document.createElement("span");
-            overlay.className = `overlay ${state.winners[b]}`;
-            overlay.textContent = state.winners[b];
-            mini.appendChild(overlay);
-        }
-        if (state.forced === b) mini.classList.add("forced");
+        cellDivs.push([]);
         for (let c = 0; c < 9; c++) {
             const cell = document.createElement("div");
-            const symbol = state.boards[b][c];
             cell.className = "cell";
-            if (symbol) {
-                cell.classList.add(symbol);
-                cell.textContent = symbol;
-            }
             cell.onclick = () => {
-                if (!isSpectator && mySymbol === state.player && !state.gameWinner) {
+                if (!isSpectator && mySymbol === gameState.player && !gameState.gameWinner) {
                     playSound('place');
                     socket.emit("move", { room: ROOM, board: b, cell: c });
                 }
             };
             mini.appendChild(cell);
+            cellDivs[b].push(cell);
         }
         boardDiv.appendChild(mini);
+        miniDivs.push(mini);
+    }
+}
+
+function renderMini(b) {
+    const mini = miniDivs[b];
+    const winner = gameState.winners[b];
+    mini.className = "mini-board";
+    const oldOverlay = mini.querySelector(".overlay");
+    if (oldOverlay) oldOverlay.remove();
+    if (winner && winner !== "D") {
+        if (lastWinners[b] !== winner) playSound('win');
+        mini.classList.add(`won-${winner}`);
+        const overlay = document.createElement("span");
+        overlay.className = `overlay ${winner}`;
+        overlay.textContent = winner;
+        mini.prepend(overlay);
+    }
+    if (gameState.forced === b) mini.classList.add("forced");
+    lastWinners[b] = winner;
+}
+
+function renderCell(b, c) {
+    const cell = cellDivs[b][c];
+    const symbol = gameState.boards[b][c];
+    cell.className = "cell";
+    cell.textContent = "";
+    if (symbol) {
+        cell.classList.add(symbol);
+        cell.textContent = symbol;
+    }
+}
+
+function renderResult() {
+    if (gameState.gameWinner && !gameEnded) {
+        showVictoryAnimation(gameState.gameWinner);
+    }
+    gameEnded = !!gameState.gameWinner;
+}
+
+function draw(state) {
+    if (!miniDivs.length) buildBoard();
+    renderResult();
+    for (let b = 0; b < 9; b++) {
+        renderMini(b);
+        for (let c = 0; c < 9; c++) renderCell(b, c);
+    }
+}
+
+// Moves arrive as deltas; a gap in sequence numbers means we missed one, so
+// fall back to a full snapshot from the server.
+function applyDelta(delta) {
+    if (delta.seq <= seq) return;
+    if (delta.seq !== seq + 1 || !miniDivs.length) {
+        if (!syncing) {
+            syncing = true;
+            socket.emit("sync", { room: ROOM });
+        }
+        return;
     }
-    lastWinners = [...state.winners];
+    seq = delta.seq;
+    const previousForced = gameState.forced;
+    gameState.boards[delta.board][delta.cell] = delta.symbol;
+    if (delta.boardWinner) gameState.winners[delta.board] = delta.boardWinner;
+    gameState.forced = delta.forced;
+    gameState.player = delta.player;
+    gameState.gameWinner = delta.gameWinner;
+    renderResult();
+    renderCell(delta.board, delta.cell);
+    renderMini(delta.board);
+    if (previousForced !== null && previousForced !== delta.board) renderMini(previousForced);
+    if (delta.forced !== null && delta.forced !== delta.board) renderMini(delta.forced);
 }
 
 function showVictoryAnimation(winner) {
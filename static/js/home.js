@@ -1,6 +1,8 @@
 const socket = io();
 
+const quickMatchBtn = document.getElementById("quick-match");
 const createBtn = document.getElementById("create");
+const createBotBtn = document.getElementById("create-bot");
 const joinBtn = document.getElementById("join");
 const roomInput = document.getElementById("room");
 
@@ -8,6 +10,30 @@ createBtn.onclick = () => {
     socket.emit("create");
 };
 
+createBotBtn.onclick = () => {
+    socket.emit("create", { bot: "medium" });
+};
+
+let searching = false;
+
+quickMatchBtn.onclick = () => {
+    socket.emit(searching ? "quick_match_cancel" : "quick_match");
+};
+
+socket.on("queued", () => {
+    searching = true;
+    quickMatchBtn.textContent = "Searching... (cancel)";
+});
+
+socket.on("queue_left", () => {
+    searching = false;
+    quickMatchBtn.textContent = "Quick Match";
+});
+
+socket.on("matched", data => {
+    window.location.href = `/game/${data.room}`;
+});
+
 socket.on("created", room => {
     window.location.href = `/game/${room}`;
 });
@@ -0,0 +1,26 @@
+import os
+import pytest
+
+# app.py reads its configuration from the environment when first imported
+os.environ['DATABASE_URL'] = 'sqlite://'
+for name in ('GAME_STORE_URL', 'SOCKETIO_MESSAGE_QUEUE', 'ROOM_SNAPSHOT_PATH', 'BOOK_PATH'):
+    os.environ.pop(name, None)
+
+@pytest.fixture
+def app_module():
+    import app
+    with app.app.app_context():
+        app.db.create_all()
+        yield app
+        app.db.session.remove()
+        app.db.drop_all()
+    app.leaderboard = None
+
+@pytest.fixture
+def socket_app():
+    # No app context held across the test: each request pushes its own, so every client logs in separately
+    import app
+    with app.app.app_context(): app.db.create_all()
+    yield app
+    with app.app.app_context(): app.db.drop_all()
+    app.leaderboard = None
@@ -0,0 +1,26 @@
+def errors(client):
+    return [message for message in client.get_received() if message["name"] == "chatError"]
+
+def test_rate_limit_is_shared_by_an_accounts_tabs(socket_app):
+    app = socket_app
+    app.chat_allowance.clear()
+    http = app.app.test_client(); http.get("/guest")
+    first, second = (app.socketio.test_client(app.app, flask_test_client=http) for _ in range(2))
+    first.emit("create", {})
+    room = [message for message in first.get_received() if message["name"] == "created"][0]["args"][0]
+    for tab in (first, second): tab.emit("join", {"room": room}); tab.get_received()
+    limit = app.app.config["CHAT_RATE_LIMIT"]
+    for i in range(limit): (first, second)[i % 2].emit("chat", {"room": room, "message": f"hello {i}"})
+    assert not errors(first) and not errors(second)
+    second.emit("chat", {"room": room, "message": "one too many"})
+    assert errors(second)
+    for tab in (first, second): tab.disconnect()
+
+def test_idle_buckets_are_pruned(socket_app):
+    app = socket_app
+    app.chat_allowance.clear()
+    window = app.app.config["CHAT_RATE_WINDOW"]
+    now = app.time.monotonic()
+    app.chat_allowance.update({("users", "1"): [0.0, now], ("users", "2"): [3.0, now - window - 1]})
+    app.prune_chat_allowance()
+    assert list(app.chat_allowance) == [("users", "1")]
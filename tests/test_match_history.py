@@ -0,0 +1,56 @@
+from sqlalchemy import insert
+
+def add_users(app, *names):
+    users = [app.User(username=name, password_hash="x") for name in names]
+    app.db.session.add_all(users); app.db.session.commit()
+    return [user.id for user in users]
+
+def walk(app, user_id, page_size):
+    pages, cursor = [], None
+    while True:
+        matches, cursor = app.match_history(user_id, cursor, page_size)
+        pages.append([match.id for match in matches])
+        if cursor is None: return pages
+
+def test_pages_cover_every_match_once(app_module):
+    app = app_module
+    me, other = add_users(app, "me", "other")
+    # No timestamp: the server default, whole seconds on SQLite, so every row shares the same one
+    app.db.session.execute(insert(app.Match), [{"player1_id": me, "player2_id": other, "winner_id": me, "is_draw": False}
+                                               for _ in range(7)])
+    app.db.session.commit()
+    pages = walk(app, me, 3)
+    ids = [match_id for page in pages for match_id in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert len(ids) == len(set(ids)) == 7
+    assert ids == sorted(ids, reverse=True)
+
+def test_other_players_matches_are_not_listed(app_module):
+    app = app_module
+    me, other, third = add_users(app, "me", "other", "third")
+    app.db.session.execute(insert(app.Match), [
+        {"player1_id": me, "player2_id": other, "winner_id": None, "is_draw": True},
+        {"player1_id": other, "player2_id": third, "winner_id": third, "is_draw": False},
+        {"player1_id": third, "player2_id": me, "winner_id": me, "is_draw": False},
+    ])
+    app.db.session.commit()
+    assert walk(app, me, 20) == [[3, 1]]
+
+def test_bad_cursor_starts_from_the_newest(app_module):
+    assert app_module.parse_match_cursor("2026-01-01T00:00:00_5") is None
+    assert app_module.parse_match_cursor(None) is None
+    assert app_module.parse_match_cursor("42") == 42
+
+def test_profile_links_the_next_page(app_module):
+    app = app_module
+    client = app.app.test_client()
+    client.post('/register', data={'username': 'me', 'password': 'pw'})
+    other, = add_users(app, "other")
+    me = app.User.query.filter_by(username="me").one().id
+    app.db.session.execute(insert(app.Match), [{"player1_id": me, "player2_id": other, "winner_id": me, "is_draw": False}
+                                               for _ in range(app.app.config['MATCH_HISTORY_PAGE_SIZE'] + 1)])
+    app.db.session.commit()
+    first = client.get('/profile').data.decode()
+    assert 'before=2' in first
+    last = client.get('/profile?before=2').data.decode()
+    assert 'Older matches' not in last
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event
+
+def row(p1, p2, winner=None):
+    return {"player1_id": p1, "player2_id": p2, "winner_id": winner, "is_draw": winner is None}
+
+def test_flush_writes_in_batches(app_module):
+    written = []
+    writer = app_module.MatchWriter(written.append, batch_size=3, interval=1.0)
+    writer.pending.extend(range(7))
+    writer.flush()
+    assert written == [[0, 1, 2], [3, 4, 5], [6]]
+    assert writer.written == 7 and not writer.pending
+
+def test_failing_batch_is_retried_then_dropped(app_module):
+    written = []
+    def write_rows(batch):
+        if 0 in batch: raise RuntimeError("bad row")
+        written.append(batch)
+    writer = app_module.MatchWriter(write_rows, batch_size=2, interval=1.0, max_attempts=3)
+    writer.pending.extend(range(4))
+    for _ in range(2):
+        with pytest.raises(RuntimeError): writer.flush()
+        assert list(writer.pending) == [0, 1, 2, 3]
+    with pytest.raises(RuntimeError): writer.flush()
+    assert writer.dropped == 2 and list(writer.pending) == [2, 3]
+    writer.flush()
+    assert written == [[2, 3]] and writer.attempts == 0
+
+def test_write_matches_updates_stats_and_the_loaded_board(app_module):
+    app = app_module
+    users = [app.User(username=name, password_hash="x") for name in ("a", "b", "c")]
+    app.db.session.add_all(users); app.db.session.commit()
+    a, b, c = (user.id for user in users)
+    app.write_matches([row(a, b, a)])
+    board = app.get_leaderboard()
+    statements = []
+    listen = lambda *args: statements.append(args[2])
+    event.listen(app.db.engine, "before_cursor_execute", listen)
+    try:
+        app.write_matches([row(a, c, c), row(b, c)])
+    finally:
+        event.remove(app.db.engine, "before_cursor_execute", listen)
+    # No reload of the UserStats rows after the commit: one SELECT for them, one for the new player's name
+    assert sum(statement.lstrip().upper().startswith("SELECT") for statement in statements) == 2
+    stats = {s.user_id: s for s in app.UserStats.query}
+    assert (stats[a].wins, stats[a].losses, stats[c].wins, stats[c].draws) == (1, 1, 1, 1)
+    assert {user_id: rating for user_id, (rating, _) in board.players.items()} == {s.user_id: s.rating for s in stats.values()}
+    assert board.players[c][1] == "c"
+
+def test_board_reloads_after_max_age(app_module, monkeypatch):
+    app = app_module
+    first = app.get_leaderboard()
+    assert app.get_leaderboard() is first  # a lone worker (the default here) keeps its board
+    monkeypatch.setitem(app.app.config, "LEADERBOARD_MAX_AGE", 30)
+    monkeypatch.setattr(app, "leaderboard_loaded", app.time.monotonic() - 31)
+    assert app.get_leaderboard() is not first
@@ -0,0 +1,87 @@
+import pytest
+from game.matchmaking import MatchQueue
+
+def player(user_id, rating):
+    return {"user_id": user_id, "rating": rating}
+
+def test_pairs_the_closest_rating_within_the_window():
+    queue = MatchQueue(window=100)
+    assert queue.add(player("a", 1000), 0) is None
+    assert queue.add(player("b", 1150), 0) is None
+    assert queue.add(player("c", 1040), 0)["user_id"] == "a"
+    assert list(queue.players) == ["b"]
+
+def test_window_widens_while_waiting():
+    queue = MatchQueue(window=100, widen_per_second=25, max_window=800)
+    queue.add(player("a", 1000), 0); queue.add(player("b", 1300), 0)
+    assert queue.sweep(7) == []  # 275 points allowed
+    (first, second), = queue.sweep(8)
+    assert (first["user_id"], second["user_id"]) == ("a", "b")
+    assert len(queue) == 0
+
+def test_window_stops_at_max_window():
+    queue = MatchQueue(window=100, widen_per_second=25, max_window=200)
+    queue.add(player("a", 1000), 0); queue.add(player("b", 1300), 0)
+    assert queue.sweep(3600) == []
+
+def test_removed_player_is_not_paired():
+    queue = MatchQueue(window=100)
+    queue.add(player("a", 1000), 0)
+    assert queue.remove("a")["user_id"] == "a"
+    assert queue.remove("a") is None
+    assert queue.add(player("b", 1000), 0) is None
+    assert "b" in queue and "a" not in queue
+
+@pytest.fixture
+def quick(socket_app, monkeypatch):
+    app = socket_app
+    for namespace in app.NAMESPACES:
+        monkeypatch.setitem(app.match_queues, namespace, app.MatchQueue())
+    app.queued_sids.clear()
+    clients = []
+    def connect(http=None):
+        if http is None: http = app.app.test_client(); http.get("/guest")
+        client = app.socketio.test_client(app.app, flask_test_client=http)
+        clients.append(client)
+        return http, client
+    yield app, connect
+    for client in clients:
+        if client.is_connected(): client.disconnect()
+
+def names(client): return [message["name"] for message in client.get_received()]
+
+def test_disconnected_player_is_skipped(quick):
+    app, connect = quick
+    _, gone = connect(); _, waiting = connect()
+    gone.emit("quick_match"); gone.disconnect()
+    waiting.emit("quick_match")
+    assert names(waiting) == ["queued"]
+    assert len(app.match_queues["guest"]) == 1
+
+def test_player_seated_meanwhile_is_skipped_and_told(quick):
+    app, connect = quick
+    _, seated = connect(); _, arriving = connect()
+    seated.emit("quick_match")
+    user_id = next(user_id for _, user_id in app.queued_sids.values())
+    app.store.set_user_room(user_id, "guest", "elsewhere")
+    try:
+        seated.get_received(); arriving.emit("quick_match")
+        assert names(seated) == ["queue_left"]
+        assert names(arriving) == ["queued"]
+        assert len(app.match_queues["guest"]) == 1
+    finally:
+        app.store.clear_user_room(user_id)
+
+def test_cancel_and_second_tab_leave_the_queue(quick):
+    app, connect = quick
+    http, first = connect()
+    first.emit("quick_match"); first.get_received()
+    first.emit("quick_match_cancel")
+    assert names(first) == ["queue_left"]
+    assert len(app.match_queues["guest"]) == 0
+    first.emit("quick_match"); first.get_received()
+    _, second = connect(http)
+    second.emit("quick_match")
+    assert names(first) == ["queue_left"]
+    assert names(second) == ["queued"]
+    assert len(app.match_queues["guest"]) == 1
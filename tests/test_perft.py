@@ -0,0 +1,10 @@
+import json
+import pytest
+from bench.engine_bench import ENGINES, FIXTURES, run_perft
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engine_matches_reference_counts(engine):
+    with open(FIXTURES) as f: fixtures = json.load(f)
+    results, mismatches = run_perft(ENGINES[engine], fixtures, max_depth=3)
+    assert mismatches == 0, [result for result in results if not result["ok"]]
+    assert {result["position"] for result in results} == {fixture["name"] for fixture in fixtures}
@@ -0,0 +1,31 @@
+import pytest
+from game.rating import INITIAL_RATING, Leaderboard, elo_update, expected_score
+
+def test_even_players_split_the_stake():
+    assert expected_score(1500, 1500) == 0.5
+    assert elo_update(1500, 1500, 1) == (1516, 1484)
+    assert elo_update(1500, 1500, 0.5) == (1500, 1500)
+
+def test_upset_moves_ratings_further_than_expected_win():
+    favourite, underdog = 1800, 1400
+    assert expected_score(favourite, underdog) == pytest.approx(1 / (1 + 10 ** -1))
+    win = elo_update(favourite, underdog, 1)
+    upset = elo_update(favourite, underdog, 0)
+    assert favourite - upset[0] > win[0] - favourite > 0
+    assert sum(win) == sum(upset) == favourite + underdog
+
+def test_rank_orders_by_rating_then_user_id():
+    board = Leaderboard()
+    for user_id, rating in ((3, 1300), (1, 1250), (2, 1300), (4, INITIAL_RATING)):
+        board.update(user_id, f"user{user_id}", rating)
+    assert [board.rank(user_id) for user_id in (2, 3, 1, 4)] == [1, 2, 3, 4]
+    assert board.rank(99) is None
+    assert [entry["user_id"] for entry in board.top(2, offset=1)] == [3, 1]
+
+def test_update_moves_a_player_without_duplicating_them():
+    board = Leaderboard()
+    board.update(1, "a", 1300); board.update(2, "b", 1200)
+    board.update(2, "b", 1350.4)
+    assert len(board) == 2
+    assert board.rank(2) == 1 and board.rank(1) == 2
+    assert board.top(1) == [{"rank": 1, "user_id": 2, "username": "b", "rating": 1350}]
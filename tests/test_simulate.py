@@ -0,0 +1,9 @@
+from game.simulate import simulate, verify
+
+def test_batch_matches_scalar_engine():
+    assert verify(300, seed=7) == []
+
+def test_seed_reproduces_games():
+    (first, _, _), (second, _, _) = simulate(200, seed=3), simulate(200, seed=3)
+    assert (first.winner == second.winner).all()
+    assert (first.macro == second.macro).all()
@@ -0,0 +1,88 @@
+import threading, time
+from collections import deque
+import fakeredis
+import pytest
+from game.bitboard import BitboardUltimateTicTacToe
+from game.logic import UltimateTicTacToe
+from game.store import RedisStore
+
+ENGINES = {"list": UltimateTicTacToe, "bitboard": BitboardUltimateTicTacToe}
+
+@pytest.fixture
+def store():
+    return RedisStore(fakeredis.FakeRedis(), ENGINES, chat_history_limit=5)
+
+def room_data(engine=UltimateTicTacToe):
+    # The shape app.new_game_data() builds
+    return {"game": engine(), "player_accounts": {}, "account_symbols": {}, "player_sids": {},
+            "players": {}, "spectators": {}, "ready": set(), "rematchReady": set(),
+            "chat_history": deque(maxlen=5), "chat_seq": 0, "rematch_declined": False, "seq": 0,
+            "moves": bytearray()}
+
+@pytest.mark.parametrize("engine", [UltimateTicTacToe, BitboardUltimateTicTacToe])
+def test_room_round_trip(store, engine):
+    game_data = room_data(engine)
+    game = game_data["game"]; game.started = True
+    for board, cell in [(4, 0), (0, 4), (4, 8), (8, 4)]:
+        game.make_move(board, cell); game_data["moves"].append(board * 9 + cell)
+    game_data["player_accounts"] = {"X": "1", "O": "2"}
+    game_data["ready"] = {"sid-a", "sid-b"}
+    game_data["chat_history"].extend({"id": i, "message": f"m{i}"} for i in range(1, 8))
+    store.create("users", "12345", game_data)
+
+    loaded = store.get("users", "12345")
+    assert type(loaded["game"]) is engine
+    assert loaded["game"].state() == game.state()
+    assert loaded["moves"] == game_data["moves"]
+    assert loaded["ready"] == {"sid-a", "sid-b"}
+    assert loaded["player_accounts"] == {"X": "1", "O": "2"}
+    assert [entry["id"] for entry in loaded["chat_history"]] == [3, 4, 5, 6, 7]
+    assert loaded["chat_history"].maxlen == 5
+
+def test_create_refuses_a_taken_code(store):
+    first = room_data(); first["seq"] = 7
+    assert store.create("users", "11111", first)
+    assert not store.create("users", "11111", room_data())
+    assert store.get("users", "11111")["seq"] == 7
+    # Codes are per namespace
+    assert store.create("guest", "11111", room_data())
+    assert store.count("users") == 1 and store.count("guest") == 1
+
+def test_transaction_writes_back(store):
+    store.create("users", "22222", room_data())
+    with store.transaction("users", "22222") as game_data:
+        game_data["seq"] = 3
+    assert store.get("users", "22222")["seq"] == 3
+    with store.transaction("users", "99999") as game_data:
+        assert game_data is None
+    assert not store.exists("users", "99999")
+
+def test_transaction_serialises_writers(store):
+    store.create("users", "33333", room_data())
+    def bump():
+        with store.transaction("users", "33333") as game_data:
+            seq = game_data["seq"]
+            time.sleep(0.01)  # without the lock, the other threads read the same seq meanwhile
+            game_data["seq"] = seq + 1
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert store.get("users", "33333")["seq"] == 8
+
+def test_deleted_room_is_not_written_back(store):
+    store.create("users", "44444", room_data())
+    with store.transaction("users", "44444") as game_data:
+        store.delete("users", "44444")
+        game_data["seq"] = 1
+    assert store.get("users", "44444") is None
+
+def test_user_room_index(store):
+    assert store.get_user_room("1") is None
+    store.set_user_room("1", "users", "55555")
+    store.set_user_room("2", "guest", "66666")
+    assert store.get_user_room("1") == ("users", "55555")
+    assert store.get_user_room("2") == ("guest", "66666")
+    assert store.count_user_rooms() == 2
+    store.clear_user_room("1")
+    assert store.get_user_room("1") is None
+    assert store.count_user_rooms() == 1